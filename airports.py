@@ -0,0 +1,178 @@
+"""Multi-airport tenancy: one database and one set of in-process state per airport.
+
+Airports listed in ``AIRPORTS`` each get their own database (see
+``db_bootstrap.airport_database_url``) plus their own recommendation
+engine and caches, gate timeline, flight archive and data integration. A
+request selects its airport with the ``X-Airport`` header or an
+``/airports/<code>/`` path prefix (``/airports/JFK/api/flights``).
+Requests without an airport use the default database, as before.
+
+Each airport has its own database and connection pool. A hub's upload or
+recompute therefore never holds the write lock or the pooled connections
+a small station needs. Heavy endpoints are also limited per airport
+(``AIRPORT_MAX_HEAVY_REQUESTS``), so one airport cannot occupy every
+worker thread. That limit only sheds load: engine runs keep their state
+per call and may overlap, and runs that apply a plan are serialized by
+the engine itself. For CPU isolation as well, run a hub on its own
+gunicorn workers with ``AIRPORT=<code>`` and route to them at the proxy.
+"""
+
+import contextvars
+import functools
+import os
+import re
+import threading
+from flask import current_app, g, jsonify, request
+from extensions import db, airport_bind
+from db_bootstrap import airport_database_url, create_airport_engine
+from data_integration import DataIntegration
+from gate_timeline import GateTimeline
+from flight_archive import FlightArchive, airport_archive_dir
+
+AIRPORT_HEADER = 'X-Airport'
+AIRPORT_CODE_PATTERN = re.compile(r'^[A-Za-z0-9]{3,4}$')
+PATH_PREFIX_PATTERN = re.compile(r'^/airports/([A-Za-z0-9]{3,4})(/.*)$')
+
+# Concurrent recommendation, solve, recovery and upload requests per airport;
+# a capacity limit, not a lock (any value is safe)
+DEFAULT_MAX_HEAVY_REQUESTS = 2
+# How long a heavy request waits for a slot before answering 503
+DEFAULT_HEAVY_WAIT_SECONDS = 30
+
+_current = contextvars.ContextVar('airport', default=None)
+
+
+class Airport:
+    """Database engine and in-process components of one airport"""
+
+    def __init__(self, code=None, engine=None, max_heavy_requests=DEFAULT_MAX_HEAVY_REQUESTS):
+        # code None is the default database bound to ``db``
+        self.code = code
+        self._engine = engine
+        self.data_integration = DataIntegration()
+        self.gate_timeline = GateTimeline()
+        # Keyed by code, not by how the airport was reached (AIRPORT or X-Airport)
+        self.flight_archive = FlightArchive(airport_archive_dir(code))
+        self.heavy_requests = threading.BoundedSemaphore(max_heavy_requests)
+        self._recommendation_engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        return self._engine or db.engine
+
+    def recommendation_engine(self):
+        # The engine pulls in the scientific stack, so it is only built on first use
+        if self._recommendation_engine is None:
+            with self._lock:
+                if self._recommendation_engine is None:
+                    from recommendation_engine import RecommendationEngine
+                    self._recommendation_engine = RecommendationEngine()
+        return self._recommendation_engine
+
+    def to_dict(self):
+        return {
+            'code': self.code,
+            'database': self.engine.url.render_as_string(hide_password=True),
+            'engine_loaded': self._recommendation_engine is not None
+        }
+
+
+class AirportRegistry:
+    """The airports this deployment serves; each is set up on first use"""
+
+    def __init__(self, app, codes=None, max_heavy_requests=None):
+        self.app = app
+        if codes is None:
+            codes = [c for c in os.getenv('AIRPORTS', '').replace(' ', '').split(',') if c]
+        self.codes = sorted({c.upper() for c in codes})
+        self.max_heavy_requests = int(
+            max_heavy_requests or os.getenv('AIRPORT_MAX_HEAVY_REQUESTS', DEFAULT_MAX_HEAVY_REQUESTS)
+        )
+        # A worker started with AIRPORT=<code> serves that airport from its default database
+        self.default_code = (os.getenv('AIRPORT') or '').upper() or None
+        self.default = Airport(self.default_code, max_heavy_requests=self.max_heavy_requests)
+        self._airports = {}
+        self._lock = threading.Lock()
+
+    def get(self, code):
+        """Airport for ``code`` (None: the default); KeyError for unknown codes"""
+        if not code or code.upper() == self.default_code:
+            return self.default
+        code = code.upper()
+        if code not in self.codes:
+            raise KeyError(code)
+        airport = self._airports.get(code)
+        if airport is None:
+            with self._lock:
+                airport = self._airports.get(code)
+                if airport is None:
+                    engine = create_airport_engine(self.app, airport_database_url(code))
+                    db.metadata.create_all(engine)
+                    airport = Airport(code, engine, self.max_heavy_requests)
+                    self._airports[code] = airport
+        return airport
+
+
+class AirportPrefixMiddleware:
+    """Serve ``/airports/<code>/...`` as ``/...`` for airport ``<code>``"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        match = PATH_PREFIX_PATTERN.match(environ.get('PATH_INFO', ''))
+        if match:
+            environ['gate.airport'] = match.group(1).upper()
+            environ['PATH_INFO'] = match.group(2)
+        return self.wsgi_app(environ, start_response)
+
+
+def current_airport():
+    """Airport of the current request, or the default one"""
+    airport = _current.get()
+    if airport is None:
+        airport = current_app.extensions['airports'].default
+    return airport
+
+
+def heavy_request(view):
+    """Limit how many requests of this kind one airport runs at once"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        airport = current_airport()
+        wait = float(os.getenv('AIRPORT_HEAVY_WAIT_SECONDS', DEFAULT_HEAVY_WAIT_SECONDS))
+        if not airport.heavy_requests.acquire(timeout=wait):
+            return jsonify({"error": f"Airport {airport.code or 'default'} is busy, retry later"}), 503
+        try:
+            return view(*args, **kwargs)
+        finally:
+            airport.heavy_requests.release()
+    return wrapper
+
+
+def init_airports(app, registry=None):
+    """Route each request's database session and components to its airport"""
+    registry = registry or AirportRegistry(app)
+    app.extensions['airports'] = registry
+    app.wsgi_app = AirportPrefixMiddleware(app.wsgi_app)
+
+    @app.before_request
+    def _select_airport():
+        code = request.environ.get('gate.airport') or request.headers.get(AIRPORT_HEADER, '').strip()
+        if code and not AIRPORT_CODE_PATTERN.match(code):
+            return jsonify({"error": "Invalid airport code"}), 400
+        try:
+            airport = registry.get(code or None)
+        except KeyError:
+            return jsonify({"error": f"Unknown airport: {code}"}), 404
+        g._airport_tokens = (_current.set(airport), airport_bind.set(airport._engine))
+
+    @app.teardown_request
+    def _reset_airport(exc=None):
+        tokens = g.pop('_airport_tokens', None)
+        if tokens is not None:
+            _current.reset(tokens[0])
+            airport_bind.reset(tokens[1])
+
+    return registry
@@ -1,38 +1,36 @@
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.local import LocalProxy
 import os
-from datetime import datetime
-from dotenv import load_dotenv
+from datetime import datetime, timedelta
 
 from extensions import db
-from models import Flight, Gate, Recommendation, AirportConfig
-from recommendation_engine import RecommendationEngine
-from data_integration import DataIntegration
-
-load_dotenv()
+from db_bootstrap import configure_database
+from models import Flight, Gate, Recommendation, RecommendationRun, AirportConfig, PassengerConnection
+from data_integration import FLIGHT_FIELDS, FLIGHT_DICT_FIELDS
+from gate_timeline import to_epoch
+from flight_archive import retention_cutoff
+from wire_format import ROW_JSON, negotiate, encode_columnar, columnar_response
+from profiling import init_profiling
+from airports import init_airports, current_airport, heavy_request
 
 app = Flask(__name__)
 CORS(app)
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///gate_reassignment.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_database(app)
 
-# SQLite can appear to "hang" when the DB is locked or accessed across threads.
-if str(app.config['SQLALCHEMY_DATABASE_URI']).startswith('sqlite:'):
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'connect_args': {
-            'check_same_thread': False,
-            'timeout': 15
-        }
-    }
+# Server-Timing spans on every response; opt-in cProfile/stack captures
+profile_store = init_profiling(app)
 
-# Initialize database
-db.init_app(app)
+# Components are per airport (X-Airport header or /airports/<code>/ prefix)
+airports = init_airports(app)
+data_integration = LocalProxy(lambda: current_airport().data_integration)
+gate_timeline = LocalProxy(lambda: current_airport().gate_timeline)
+flight_archive = LocalProxy(lambda: current_airport().flight_archive)
 
-# Initialize components
-recommendation_engine = RecommendationEngine()
-data_integration = DataIntegration()
+def get_recommendation_engine():
+    return current_airport().recommendation_engine()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -44,8 +42,9 @@ def reset_db():
         if request.remote_addr not in ('127.0.0.1', '::1'):
             return jsonify({"error": "Forbidden"}), 403
         db.session.remove()
-        db.drop_all()
-        db.create_all()
+        engine = current_airport().engine
+        db.metadata.drop_all(engine)
+        db.metadata.create_all(engine)
         return jsonify({"success": True, "message": "Database schema reset (drop_all/create_all) completed."})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -54,6 +53,11 @@ def reset_db():
 def flights():
     if request.method == 'GET':
         try:
+            media_type = negotiate(request)
+            if media_type != ROW_JSON:
+                rows = data_integration.get_flight_rows()
+                payload = encode_columnar(FLIGHT_FIELDS, rows, dict_fields=FLIGHT_DICT_FIELDS)
+                return columnar_response(request, payload, media_type)
             flights = data_integration.get_flights()
             return jsonify(flights)
         except Exception as e:
@@ -67,20 +71,114 @@ def flights():
             return jsonify({"error": str(e)}), 500
     elif request.method == 'DELETE':
         try:
-            from models import Flight, Recommendation
-            Flight.query.delete()
+            PassengerConnection.query.delete()
             Recommendation.query.delete()
+            Flight.query.delete()
             db.session.commit()
+            gate_timeline.clear()
             return jsonify({"success": True, "message": "All flights and recommendations cleared."})
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
+@app.route('/api/connections', methods=['GET', 'POST'])
+def passenger_connections():
+    """Connecting passenger counts between flights (inbound -> outbound)"""
+    if request.method == 'GET':
+        try:
+            return jsonify(data_integration.get_connections(request.args.get('date')))
+        except ValueError as ve:
+            return jsonify({"error": str(ve)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    try:
+        data = request.get_json()
+        items = data.get('connections', []) if isinstance(data, dict) else data
+        result = data_integration.save_connections(items or [])
+        return jsonify({"success": True, **result})
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/flights/archive', methods=['POST'])
+def archive_flights():
+    """Move flights older than the retention window (or ``before``) to the archive"""
+    try:
+        data = request.get_json(silent=True) or {}
+        cutoff = None
+        if data.get('before'):
+            cutoff = datetime.fromisoformat(data['before']).date()
+        elif data.get('retention_days') is not None:
+            cutoff = retention_cutoff(data['retention_days'])
+        result = flight_archive.archive_before(cutoff)
+        return jsonify({"success": True, **result})
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/flights/history', methods=['GET'])
+def flight_history():
+    """Flights in a date range, including archived days"""
+    try:
+        start = datetime.fromisoformat(request.args['start']).date()
+        end = datetime.fromisoformat(request.args.get('end', request.args['start'])).date()
+        if end < start:
+            return jsonify({"error": "end must not be before start"}), 400
+        return jsonify(flight_archive.query_range(start, end))
+    except KeyError:
+        return jsonify({"error": "start is required"}), 400
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _parse_timeline_bound(value):
+    """Accept epoch seconds or an ISO datetime for timeline window bounds"""
+    if value is None or value == '':
+        return None
+    try:
+        return int(float(value))
+    except ValueError:
+        return to_epoch(datetime.fromisoformat(value))
+
+@app.route('/api/timeline', methods=['GET'])
+def gate_timeline_view():
+    """Windowed gate x time occupancy slice in columnar form for Gantt rendering"""
+    try:
+        date_param = request.args.get('date')
+        if date_param:
+            day_start = datetime.fromisoformat(date_param)
+        else:
+            day_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = _parse_timeline_bound(request.args.get('start'))
+        end = _parse_timeline_bound(request.args.get('end'))
+        if start is None:
+            start = to_epoch(day_start)
+        if end is None:
+            end = start + 24 * 3600
+        if end <= start:
+            return jsonify({"error": "end must be after start"}), 400
+
+        timeline = gate_timeline.slice(
+            start, end,
+            gate_from=request.args.get('gate_from'),
+            gate_to=request.args.get('gate_to')
+        )
+        return jsonify(timeline)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/recommendations', methods=['POST'])
+@heavy_request
 def generate_recommendations():
     try:
         data = request.get_json()
         flight_ids = data.get('flight_ids', [])
-        recs = recommendation_engine.generate_recommendations(flight_ids)
+        result = get_recommendation_engine().generate_recommendations(flight_ids)
+        recs = result['recommendations']
 
         # Return the best (top-scoring) gate per flight as a simple mapping
         best_by_flight = {}
@@ -91,7 +189,60 @@ def generate_recommendations():
             if fid not in best_by_flight:
                 best_by_flight[fid] = rec.get('gate_number')
 
-        return jsonify({"recommendations": best_by_flight, "details": recs})
+        media_type = negotiate(request)
+        if media_type != ROW_JSON:
+            score_names = sorted({name for rec in recs for name in rec['scores']})
+            fields = ['flight_id', 'gate_id', 'gate_number', 'total_score'] + [f'score_{n}' for n in score_names]
+            rows = [
+                (rec['flight_id'], rec['gate_id'], rec['gate_number'], rec['total_score'],
+                 *[rec['scores'].get(n) for n in score_names])
+                for rec in recs
+            ]
+            payload = {
+                "recommendations": best_by_flight,
+                "details": encode_columnar(fields, rows, dict_fields=('gate_number',)),
+                "timings": result['timings'],
+                "run_id": result['run_id']
+            }
+            return columnar_response(request, payload, media_type)
+
+        return jsonify({
+            "recommendations": best_by_flight, "details": recs,
+            "timings": result['timings'], "run_id": result['run_id']
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recommendations/runs', methods=['GET'])
+def list_recommendation_runs():
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        runs = RecommendationRun.query.order_by(RecommendationRun.id.desc()).limit(limit).all()
+        return jsonify([run.to_dict() for run in runs])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recommendations/runs/<int:run_id>', methods=['GET'])
+def get_recommendation_run(run_id):
+    try:
+        snapshot = get_recommendation_engine().history.snapshot(run_id)
+        if snapshot is None:
+            return jsonify({"error": "Run not found"}), 404
+        return jsonify(snapshot)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recommendations/diff', methods=['GET'])
+def diff_recommendation_runs():
+    """Why did gates change between two runs: ?from=<run_id>&to=<run_id>"""
+    try:
+        from_id = request.args.get('from', type=int)
+        to_id = request.args.get('to', type=int)
+        if from_id is None or to_id is None:
+            return jsonify({"error": "from and to are required"}), 400
+        return jsonify(get_recommendation_engine().history.diff(from_id, to_id))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -105,6 +256,43 @@ def assign_gates():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/solve', methods=['POST'])
+@heavy_request
+def solve_day():
+    """Whole-day gate assignment honouring capacity and adjacency rules"""
+    try:
+        data = request.get_json() or {}
+        day = datetime.fromisoformat(data['date']).date()
+        result = get_recommendation_engine().solve_day(day, apply=bool(data.get('apply')))
+        return jsonify({"success": True, **result})
+    except KeyError:
+        return jsonify({"error": "date is required"}), 400
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/recovery', methods=['POST'])
+@heavy_request
+def recover_day():
+    """Repair the day's plan after disruptions within a wall-clock budget"""
+    try:
+        data = request.get_json() or {}
+        day = datetime.fromisoformat(data['date']).date()
+        result = get_recommendation_engine().recover_day(
+            day,
+            budget_ms=int(data.get('budget_ms', 2000)),
+            apply=bool(data.get('apply')),
+            seed=int(data.get('seed', 0))
+        )
+        return jsonify({"success": True, **result})
+    except KeyError:
+        return jsonify({"error": "date is required"}), 400
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/config', methods=['GET', 'POST'])
 def manage_config():
     if request.method == 'GET':
@@ -154,6 +342,7 @@ def manage_config():
             return jsonify({"error": str(e)}), 500
 
 @app.route('/api/upload', methods=['POST'])
+@heavy_request
 def upload_flight_data():
     try:
         if 'file' not in request.files:
@@ -175,7 +364,8 @@ def upload_flight_data():
         logger.info("File saved to temp: %s", tmp_path)
         
         try:
-            result = data_integration.process_uploaded_file_path(tmp_path)
+            dry_run = str(request.values.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+            result = data_integration.process_uploaded_file_path(tmp_path, dry_run=dry_run)
             logger.info("Processing completed: %s", result)
             return jsonify({"success": True, **result})
         finally:
@@ -208,7 +398,38 @@ def download_template(filename):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/airports', methods=['GET'])
+def list_airports():
+    try:
+        return jsonify({
+            "airports": airports.codes,
+            "default": airports.default_code,
+            "current": current_airport().to_dict()
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    try:
+        return jsonify(profile_store.list())
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def download_profile(profile_id):
+    """Download a capture: .prof (pstats) or .folded (flame graph stacks)"""
+    try:
+        found = profile_store.path(profile_id)
+        if found is None or not os.path.exists(found[0]):
+            return jsonify({"error": "Profile not found"}), 404
+        return send_file(found[0], as_attachment=True, download_name=found[1]['file'])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
-    app.run(debug=True, use_reloader=False, host='0.0.0.0', port=5001)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    debug = os.getenv('FLASK_DEBUG', 'False').lower() in ('1', 'true', 'yes')
+    app.run(debug=debug, use_reloader=False, threaded=True, host='0.0.0.0', port=int(os.getenv('PORT', 5001)))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""Archive flights older than the retention window out of the live table.
+
+Intended to run daily (e.g. from cron):
+
+    python archive_flights.py                 # keep FLIGHT_RETENTION_DAYS (default 30)
+    python archive_flights.py --days 7
+    python archive_flights.py --before 2025-01-01
+    AIRPORT=JFK python archive_flights.py     # one airport's database and archive
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db_bootstrap import create_db_app
+from flight_archive import FlightArchive, airport_archive_dir, retention_cutoff
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive past flights to compressed daily partitions')
+    parser.add_argument('--days', type=int, help='days of flights to keep in the live table')
+    parser.add_argument('--before', help='archive flights scheduled before this date (YYYY-MM-DD)')
+    parser.add_argument('--archive-dir', help='archive root (default FLIGHT_ARCHIVE_DIR or instance/flight_archive); '
+                                              'an airport archives into <root>/<code>')
+    args = parser.parse_args()
+
+    # Reads .env, so AIRPORT is known before the archive directory is picked
+    app = create_db_app()
+    archive = FlightArchive(
+        archive_dir=airport_archive_dir(os.getenv('AIRPORT'), args.archive_dir), retention_days=args.days
+    )
+    cutoff = date.fromisoformat(args.before) if args.before else retention_cutoff(archive.retention_days)
+
+    with app.app_context():
+        result = archive.archive_before(cutoff)
+
+    print(f"Archived {result['archived_flights']} flights over {result['archived_days']} days "
+          f"scheduled before {result['cutoff']} to {archive.archive_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Measure cold import time of the API and maintenance entry points.
+
+Each target is imported in a fresh interpreter (as a gunicorn worker or CLI
+run would) and the script reports the median wall time plus which heavy
+modules ended up loaded.
+
+    python bench_startup.py [--runs 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+TARGETS = [
+    ('db_bootstrap (maintenance scripts)', 'import db_bootstrap; db_bootstrap.create_db_app()'),
+    ('app (API worker)', 'import app'),
+    ('recommendation_engine (scoring)', 'import recommendation_engine'),
+]
+
+HEAVY_MODULES = ('pandas', 'numpy', 'scipy', 'requests', 'openpyxl')
+
+PROBE = (
+    "import sys; {stmt}; "
+    "print(','.join(m for m in {heavy!r} if m in sys.modules))"
+)
+
+
+def time_import(stmt, runs):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    code = PROBE.format(stmt=stmt, heavy=HEAVY_MODULES)
+    timings = []
+    loaded = ''
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=cwd,
+            capture_output=True, text=True, check=True
+        )
+        timings.append(time.perf_counter() - start)
+        loaded = result.stdout.strip()
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per target')
+    args = parser.parse_args()
+
+    print(f"{'target':<40} {'median':>10}  heavy modules loaded")
+    for label, stmt in TARGETS:
+        median, loaded = time_import(stmt, args.runs)
+        print(f"{label:<40} {median * 1000:>8.0f}ms  {loaded or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,11 +5,15 @@ import os
 import sys
 sys.path.insert(0, os.path.dirname(__file__))
 
-from app import app, db
-from models import Flight, Recommendation
+from db_bootstrap import create_db_app
+from extensions import db
+from models import Flight, Recommendation, PassengerConnection
+
+app = create_db_app()
 
 with app.app_context():
-    Flight.query.delete()
+    PassengerConnection.query.delete()
     Recommendation.query.delete()
+    Flight.query.delete()
     db.session.commit()
     print('All flight and recommendation data cleared.')
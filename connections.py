@@ -0,0 +1,99 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from gate_timeline import flight_interval, to_epoch
+
+# Minimum connection time between in-block and off-block, in minutes
+DEFAULT_MCT_MINUTES = 45
+
+# Average passenger walking speed (about 1.2 m/s)
+WALKING_METRES_PER_MINUTE = 72
+
+
+class ConnectionMatrix:
+    """Connecting-passenger costs for every (flight, candidate gate) pair of a day.
+
+    Connections form a sparse flight x flight matrix of passenger counts. For
+    each connection end and each candidate gate, the transfer walk to the
+    partner flight's gate comes from the terminal layout's gate-distance table.
+    Per-connection costs are summed per flight with a sparse incidence
+    matrix, which gives two dense flights x gates tables:
+
+    - ``missed``: passengers whose connection would drop below the minimum
+      connection time once the walk is included.
+    - ``transfer``: passenger-metres walked to the partner gates.
+
+    Scoring a batch of pairs is then a fancy-indexed gather.
+    """
+
+    def __init__(self, flights, connections, layout, mct_minutes=DEFAULT_MCT_MINUTES,
+                 walking_speed=WALKING_METRES_PER_MINUTE):
+        """``flights`` need id/assigned_gate/flight times; ``connections`` are
+        (inbound_flight_id, outbound_flight_id, passengers) tuples."""
+        self.flight_index = {f.id: i for i, f in enumerate(flights)}
+        self.gate_index = layout.gate_index if layout else {}
+        n_flights, n_gates = len(flights), len(self.gate_index)
+
+        self.pax = csr_matrix((n_flights, n_flights))
+        self.missed = np.zeros((n_flights, n_gates))
+        self.transfer = np.zeros((n_flights, n_gates))
+        if not connections or not n_gates:
+            return
+
+        arrivals = np.full(n_flights, np.nan)
+        departures = np.full(n_flights, np.nan)
+        gates = np.full(n_flights, -1)
+        for i, flight in enumerate(flights):
+            interval = flight_interval(flight)
+            if interval:
+                arrivals[i] = to_epoch(interval[0]) / 60
+                departures[i] = to_epoch(interval[1]) / 60
+            gates[i] = self.gate_index.get(flight.assigned_gate, -1)
+
+        links = np.array([
+            (self.flight_index[a], self.flight_index[b], p)
+            for a, b, p in connections
+            if a in self.flight_index and b in self.flight_index and p
+        ], dtype=float).reshape(-1, 3)
+        inbound, outbound, pax = links[:, 0].astype(int), links[:, 1].astype(int), links[:, 2]
+        self.pax = csr_matrix((pax, (inbound, outbound)), shape=(n_flights, n_flights))
+
+        # Each connection is scored from both ends: moving either flight changes the walk
+        ends = np.concatenate([inbound, outbound])
+        partners = np.concatenate([outbound, inbound])
+        pax = np.concatenate([pax, pax])
+        available = np.tile(departures[outbound] - arrivals[inbound], 2)
+
+        known = gates[partners] >= 0
+        ends, partners, pax, available = ends[known], partners[known], pax[known], available[known]
+        if not len(ends):
+            return
+
+        walk = layout.gate_distances[gates[partners]]
+        unreachable = ~np.isfinite(walk)
+        walk = np.where(unreachable, 0.0, walk)
+
+        slack = available[:, None] - mct_minutes - walk / walking_speed
+        at_risk = (slack < 0) & ~unreachable & np.isfinite(available)[:, None]
+
+        incidence = csr_matrix(
+            (np.ones(len(ends)), (ends, np.arange(len(ends)))), shape=(n_flights, len(ends))
+        )
+        self.missed = np.asarray(incidence @ (pax[:, None] * at_risk))
+        self.transfer = np.asarray(incidence @ (pax[:, None] * walk))
+
+    def gather(self, flight_ids, gate_numbers):
+        """(passengers at risk, passenger-metres walked) for flights x gates.
+
+        Flights or gates outside the matrix contribute zero.
+        """
+        missed = np.zeros((len(flight_ids), len(gate_numbers)))
+        transfer = np.zeros_like(missed)
+        rows = np.array([self.flight_index.get(f, -1) for f in flight_ids], dtype=int)
+        cols = np.array([self.gate_index.get(g, -1) for g in gate_numbers], dtype=int)
+        known_rows, known_cols = np.flatnonzero(rows >= 0), np.flatnonzero(cols >= 0)
+        if len(known_rows) and len(known_cols) and self.missed.shape[1]:
+            block = np.ix_(rows[known_rows], cols[known_cols])
+            target = np.ix_(known_rows, known_cols)
+            missed[target] = self.missed[block]
+            transfer[target] = self.transfer[block]
+        return missed, transfer
@@ -1,11 +1,35 @@
-import pandas as pd
-import requests
 from datetime import datetime, timedelta
-from io import StringIO
 import json
-from models import Flight, Gate, AirportConfig
+from models import Flight, Gate, AirportConfig, PassengerConnection, flight_to_dict
 from extensions import db
-from sqlalchemy import and_, or_
+from profiling import span, timed_iter
+from sqlalchemy import and_, or_, insert
+
+# Flight columns sent over the wire, in to_dict order
+FLIGHT_FIELDS = (
+    'id', 'flight_number', 'scheduled_date', 'scheduled_time',
+    'aircraft_registration', 'aircraft_type', 'new_position', 'old_position',
+    'assigned_gate', 'planned_gate', 'aldt', 'aibt', 'eldt', 'eibt',
+    'aobt', 'atot', 'tobt', 'ttot', 'flight_type', 'status',
+    'created_at', 'updated_at'
+)
+
+# Low-cardinality string columns worth dictionary-encoding
+FLIGHT_DICT_FIELDS = (
+    'aircraft_type', 'new_position', 'old_position', 'assigned_gate',
+    'planned_gate', 'flight_type', 'status'
+)
+
+REQUIRED_UPLOAD_COLUMNS = [
+    'flight_number', 'scheduled_date', 'scheduled_time',
+    'aircraft_registration', 'aircraft_type', 'flight_type'
+]
+
+# Rows parsed and inserted per transaction during uploads
+UPLOAD_BATCH_SIZE = 1000
+
+# Cap on problems echoed back in the upload response
+MAX_REPORTED_PROBLEMS = 1000
 
 class DataIntegration:
     def __init__(self):
@@ -20,19 +44,27 @@ class DataIntegration:
     
     def get_flights(self, date=None):
         """Get flights from database or external APIs"""
+        # Column-only rows serialize like ORM instances without loading them
+        query = db.session.query(*[getattr(Flight, field) for field in FLIGHT_FIELDS])
         if date:
             target_date = datetime.strptime(date, '%Y-%m-%d').date()
-            flights = Flight.query.filter(
-                Flight.scheduled_date == target_date
-            ).order_by(Flight.scheduled_date.asc(), Flight.scheduled_time.asc()).all()
-        else:
-            flights = Flight.query.order_by(Flight.scheduled_date.asc(), Flight.scheduled_time.asc()).all()
+            query = query.filter(Flight.scheduled_date == target_date)
+        flights = query.order_by(Flight.scheduled_date.asc(), Flight.scheduled_time.asc()).all()
         
         if date and not flights:
             # If no flights in database for a specific date, try to fetch from external APIs
             flights = self._fetch_flights_from_apis(target_date)
         
-        return [flight.to_dict() for flight in flights]
+        return [flight_to_dict(flight) for flight in flights]
+
+    def get_flight_rows(self, date=None):
+        """Get flights as plain tuples in FLIGHT_FIELDS order (no ORM instances)"""
+        query = db.session.query(*[getattr(Flight, field) for field in FLIGHT_FIELDS])
+        if date:
+            target_date = datetime.strptime(date, '%Y-%m-%d').date()
+            query = query.filter(Flight.scheduled_date == target_date)
+        query = query.order_by(Flight.scheduled_date.asc(), Flight.scheduled_time.asc())
+        return [tuple(row) for row in query]
     
     def create_flight(self, flight_data):
         """Create a new flight"""
@@ -211,6 +243,73 @@ class DataIntegration:
         db.session.commit()
         return updated_count
     
+    def _resolve_flight_id(self, item, prefix, cache):
+        """Flight id from ``<prefix>_flight_id`` or ``<prefix>_flight_number`` + ``scheduled_date``"""
+        flight_id = item.get(f'{prefix}_flight_id')
+        if flight_id:
+            return int(flight_id)
+        flight_number = item.get(f'{prefix}_flight_number')
+        scheduled_date = item.get(f'{prefix}_scheduled_date') or item.get('scheduled_date')
+        if not flight_number or not scheduled_date:
+            return None
+        key = (flight_number, scheduled_date)
+        if key not in cache:
+            flight = Flight.query.filter_by(
+                flight_number=flight_number,
+                scheduled_date=datetime.fromisoformat(scheduled_date).date()
+            ).first()
+            cache[key] = flight.id if flight else None
+        return cache[key]
+
+    def save_connections(self, items):
+        """Upsert connecting passenger counts between flights"""
+        cache = {}
+        saved = 0
+        skipped = []
+        try:
+            pairs = {}
+            for idx, item in enumerate(items):
+                inbound = self._resolve_flight_id(item, 'inbound', cache)
+                outbound = self._resolve_flight_id(item, 'outbound', cache)
+                if not inbound or not outbound or inbound == outbound:
+                    skipped.append(idx)
+                    continue
+                pairs[(inbound, outbound)] = (idx, int(item.get('passengers') or 0))
+
+            referenced = {fid for pair in pairs for fid in pair}
+            known = {fid for (fid,) in db.session.query(Flight.id).filter(Flight.id.in_(referenced))}
+            for pair in [p for p in pairs if p[0] not in known or p[1] not in known]:
+                skipped.append(pairs.pop(pair)[0])
+
+            existing = {
+                (c.inbound_flight_id, c.outbound_flight_id): c
+                for c in PassengerConnection.query.filter(
+                    PassengerConnection.inbound_flight_id.in_({p[0] for p in pairs})
+                )
+            }
+            for (inbound, outbound), (_, passengers) in pairs.items():
+                connection = existing.get((inbound, outbound))
+                if connection is None:
+                    connection = PassengerConnection(inbound_flight_id=inbound, outbound_flight_id=outbound)
+                    db.session.add(connection)
+                connection.passengers = passengers
+                saved += 1
+            db.session.commit()
+            return {'saved': saved, 'skipped': sorted(skipped)}
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def get_connections(self, date=None):
+        """Connections, optionally only those whose inbound flight is on ``date``"""
+        query = PassengerConnection.query
+        if date:
+            target_date = datetime.strptime(date, '%Y-%m-%d').date()
+            query = query.join(Flight, Flight.id == PassengerConnection.inbound_flight_id).filter(
+                Flight.scheduled_date == target_date
+            )
+        return [c.to_dict() for c in query.all()]
+
     def get_airport_config(self):
         """Get airport configuration"""
         configs = AirportConfig.query.all()
@@ -255,79 +354,173 @@ class DataIntegration:
         finally:
             os.unlink(tmp_path)
 
-    def process_uploaded_file_path(self, file_path):
-        """Process uploaded flight data file from a path (logs each step)"""
+    def _read_upload(self, file_path, batch_size):
+        """Open an upload and return (columns, iterator of DataFrame batches).
+
+        Only the header is read up front so column validation can fail fast;
+        rows are then streamed in fixed-size batches.
+        """
+        if file_path.endswith('.xlsx'):
+            return self._read_excel_streaming(file_path, batch_size)
+
+        import pandas as pd
+        from upload_validation import number_rows
+        if file_path.endswith('.csv'):
+            columns = [str(c).strip() for c in pd.read_csv(file_path, nrows=0).columns]
+
+            def batches():
+                # Blank lines are kept until numbered so row numbers match the file
+                first_row = 2
+                for chunk in pd.read_csv(file_path, chunksize=batch_size, dtype=object, skip_blank_lines=False):
+                    chunk.columns = columns
+                    size = len(chunk)
+                    chunk = number_rows(chunk, first_row)
+                    first_row += size
+                    if len(chunk):
+                        yield chunk
+            return columns, batches()
+        if file_path.endswith('.xls'):
+            # Legacy .xls has no streaming reader; load it whole
+            df = pd.read_excel(file_path, dtype=object)
+            columns = [str(c).strip() for c in df.columns]
+            df.columns = columns
+            df = number_rows(df, 2)
+
+            def batches():
+                for offset in range(0, len(df), batch_size):
+                    yield df.iloc[offset:offset + batch_size]
+            return columns, batches()
+        raise ValueError("Unsupported file format. Please upload CSV or Excel file.")
+
+    def _read_excel_streaming(self, file_path, batch_size):
+        """Stream .xlsx rows with openpyxl read-only mode (no full workbook DOM)"""
+        import pandas as pd
+        from openpyxl import load_workbook
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            workbook.close()
+            raise ValueError("Uploaded workbook is empty")
+        columns = [str(c).strip() if c is not None else '' for c in header]
+
+        def batches():
+            try:
+                batch, row_numbers = [], []
+                # iter_rows yields blank rows too, so enumerate gives the sheet row
+                for row_number, values in enumerate(rows, start=2):
+                    if all(v is None or v == '' for v in values):
+                        continue
+                    batch.append(values)
+                    row_numbers.append(row_number)
+                    if len(batch) >= batch_size:
+                        yield pd.DataFrame.from_records(batch, columns=columns, index=row_numbers)
+                        batch, row_numbers = [], []
+                if batch:
+                    yield pd.DataFrame.from_records(batch, columns=columns, index=row_numbers)
+            finally:
+                workbook.close()
+        return columns, batches()
+
+    def process_uploaded_file_path(self, file_path, dry_run=False):
+        """Process uploaded flight data file from a path (logs each step).
+
+        Rows are validated in vectorized batches; invalid rows are skipped and
+        reported as [row, column, reason]. With ``dry_run`` nothing is written
+        and ``saved_flights`` is the number of flights that would be added.
+        """
         import logging
+        from upload_validation import validate_batches
         logger = logging.getLogger(__name__)
-        logger.info("process_uploaded_file_path: start %s", file_path)
+        logger.info("process_uploaded_file_path: start %s (dry_run=%s)", file_path, dry_run)
         try:
-            import pandas as pd
-            logger.info("Reading file with pandas...")
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            elif file_path.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(file_path)
-            else:
-                raise ValueError("Unsupported file format. Please upload CSV or Excel file.")
-            logger.info("File read, shape: %s", df.shape)
-            
-            # Validate required columns
-            required_columns = [
-                'flight_number', 'scheduled_date', 'scheduled_time',
-                'aircraft_registration', 'aircraft_type', 'flight_type'
-            ]
+            logger.info("Reading header...")
+            with span('upload.parse'):
+                columns, batches = self._read_upload(file_path, UPLOAD_BATCH_SIZE)
+            # Batches are read lazily, so parsing is timed inside validation
+            batches = timed_iter('upload.validate.parse', batches)
+
+            # Validate required columns before touching any data rows
             logger.info("Validating columns...")
-            missing_columns = [col for col in required_columns if col not in df.columns]
+            missing_columns = [col for col in REQUIRED_UPLOAD_COLUMNS if col not in columns]
             if missing_columns:
                 raise ValueError(f"Missing required columns: {', '.join(missing_columns)}")
             logger.info("Columns validated")
-            
-            # Process and save flights in batches to avoid hanging
-            flights = []
-            batch_size = 100
+
+            gate_numbers = sorted(g for (g,) in db.session.query(Gate.gate_number))
+
+            processed_rows = 0
+            invalid_rows = 0
             saved_total = 0
+            errors, warnings = [], []
+            error_count = warning_count = 0
             logger.info("Processing rows...")
-            for idx, row in df.iterrows():
-                try:
-                    scheduled_time_val = row['scheduled_time']
-                    scheduled_time = pd.to_datetime(scheduled_time_val).time()
-                    flight = Flight(
-                        flight_number=row['flight_number'],
-                        scheduled_date=pd.to_datetime(row['scheduled_date']).date(),
-                        scheduled_time=scheduled_time,
-                        aircraft_registration=row.get('aircraft_registration', ''),
-                        aircraft_type=row['aircraft_type'],
-                        new_position=row.get('new_position', ''),
-                        old_position=row.get('old_position', ''),
-                        assigned_gate=row.get('assigned_gate', ''),
-                        planned_gate=row.get('planned_gate', ''),
-                        flight_type=row['flight_type'],
-                        status=row.get('status', 'scheduled')
-                    )
-                    flights.append(flight)
-                    # Commit every batch_size rows to avoid long transaction
-                    if (idx + 1) % batch_size == 0:
-                        logger.info("Committing batch at row %d", idx+1)
-                        saved_total += self._save_flights(flights)
-                        flights = []
-                except Exception as e:
-                    logger.error("Error processing row %d: %s", idx, e)
-            
-            # Save any remaining flights
-            if flights:
-                logger.info("Committing final batch (%d flights)", len(flights))
-                saved_total += self._save_flights(flights)
-            
-            logger.info("Processing complete")
+            validated = timed_iter('upload.validate', validate_batches(batches, gate_numbers))
+            for size, values, batch_errors, batch_warnings in validated:
+                processed_rows += size
+                invalid_rows += size - len(values)
+                error_count += len(batch_errors)
+                warning_count += len(batch_warnings)
+                errors.extend(batch_errors[:MAX_REPORTED_PROBLEMS - len(errors)])
+                warnings.extend(batch_warnings[:MAX_REPORTED_PROBLEMS - len(warnings)])
+                saved_total += self._save_flight_rows(values, dry_run=dry_run)
+                logger.info("Processed batch through row %d", processed_rows)
+
+            logger.info("Processing complete (%d errors, %d warnings)", error_count, warning_count)
             return {
-                'processed_rows': len(df),
+                'processed_rows': processed_rows,
                 'saved_flights': saved_total,
-                'columns': list(df.columns)
+                'invalid_rows': invalid_rows,
+                'error_count': error_count,
+                'warning_count': warning_count,
+                'errors': errors,
+                'warnings': warnings,
+                'truncated': error_count > len(errors) or warning_count > len(warnings),
+                'dry_run': dry_run,
+                'columns': columns
             }
         except Exception as e:
             logger.error("Exception in process_uploaded_file_path: %s", e)
             raise
-    
+
+    def _save_flight_rows(self, rows, dry_run=False):
+        """Bulk insert flight column dicts, skipping ones that already exist.
+
+        Existing (flight_number, scheduled_date) pairs are looked up with one
+        query per batch instead of one per flight. Returns the number of new
+        flights (inserted, or that would be with ``dry_run``).
+        """
+        if not rows:
+            return 0
+        try:
+            with span('upload.dedupe'):
+                numbers = {r['flight_number'] for r in rows}
+                dates = {r['scheduled_date'] for r in rows}
+                seen = set(
+                    db.session.query(Flight.flight_number, Flight.scheduled_date).filter(
+                        Flight.flight_number.in_(numbers),
+                        Flight.scheduled_date.in_(dates)
+                    )
+                )
+
+                new_rows = []
+                for r in rows:
+                    key = (r['flight_number'], r['scheduled_date'])
+                    if key not in seen:
+                        seen.add(key)
+                        new_rows.append(r)
+
+            if dry_run:
+                return len(new_rows)
+            with span('upload.insert'):
+                if new_rows:
+                    db.session.execute(insert(Flight), new_rows)
+                db.session.commit()
+            return len(new_rows)
+        except Exception:
+            db.session.rollback()
+            raise
+
     def initialize_default_config(self):
         """Initialize default airport configuration"""
         default_configs = [
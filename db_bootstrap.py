@@ -0,0 +1,111 @@
+"""Database-only application setup shared by the API and maintenance scripts.
+
+Scripts such as clear_flights.py and init_data.py only need a configured
+SQLAlchemy session, so they build a bare Flask app here instead of importing
+app.py (and with it the routes, CORS and the recommendation engine).
+"""
+
+import os
+import sqlite3
+from flask import Flask
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from extensions import db
+
+DEFAULT_DATABASE_URL = 'sqlite:///gate_reassignment.db'
+
+# Per-airport database URL; {airport} is the lower-case airport code
+DEFAULT_AIRPORT_DATABASE_URL = 'sqlite:///gate_reassignment_{airport}.db'
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+@event.listens_for(Engine, 'connect')
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Put every SQLite connection in WAL mode so readers never wait on a writer.
+
+    synchronous=NORMAL is durable across application crashes in WAL mode and
+    avoids an fsync per commit. busy_timeout makes a blocked writer retry with
+    SQLite's own backoff instead of failing immediately with "database is locked".
+    """
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={_env_int('SQLITE_BUSY_TIMEOUT_MS', 15000)}")
+    cursor.close()
+
+
+def engine_options(database_uri):
+    """SQLAlchemy engine options tuned for the configured backend"""
+    if database_uri.startswith('sqlite:'):
+        return {
+            'connect_args': {
+                # Pooled connections are handed between worker threads
+                'check_same_thread': False,
+                'timeout': _env_int('SQLITE_BUSY_TIMEOUT_MS', 15000) / 1000
+            }
+        }
+
+    # Server databases (PostgreSQL): size the pool per worker process. With
+    # gunicorn, total connections = workers x (pool_size + max_overflow).
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True
+    }
+
+
+def airport_database_url(code):
+    """DATABASE_URL_<CODE> if set, else AIRPORT_DATABASE_URL for that airport"""
+    url = os.getenv(f'DATABASE_URL_{code.upper()}')
+    if url:
+        return url
+    return os.getenv('AIRPORT_DATABASE_URL', DEFAULT_AIRPORT_DATABASE_URL).format(airport=code.lower())
+
+
+def create_airport_engine(app, database_uri):
+    """Engine for another airport's database, set up like the app's own.
+
+    Relative SQLite paths land in the instance folder, as Flask-SQLAlchemy
+    does for SQLALCHEMY_DATABASE_URI.
+    """
+    url = make_url(database_uri)
+    if url.drivername.startswith('sqlite') and url.database and url.database != ':memory:' \
+            and not os.path.isabs(url.database):
+        os.makedirs(app.instance_path, exist_ok=True)
+        url = url.set(database=os.path.join(app.instance_path, url.database))
+    return create_engine(url, **engine_options(database_uri))
+
+
+def configure_database(app):
+    """Apply database settings from the environment and bind ``db`` to app.
+
+    With AIRPORT set, the app's default database is that airport's, which
+    is how maintenance scripts and dedicated workers target one airport.
+    """
+    load_dotenv()
+    airport = os.getenv('AIRPORT')
+    app.config['SQLALCHEMY_DATABASE_URI'] = (
+        airport_database_url(airport) if airport else os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL)
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(str(app.config['SQLALCHEMY_DATABASE_URI']))
+
+    db.init_app(app)
+    return app
+
+
+def create_db_app():
+    """Create a minimal Flask app with only the database configured"""
+    # Same instance/ folder as app.py so relative SQLite URLs hit the same file
+    root_path = os.path.dirname(os.path.abspath(__file__))
+    app = Flask(__name__, root_path=root_path, instance_path=os.path.join(root_path, 'instance'))
+    return configure_database(app)
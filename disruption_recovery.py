@@ -0,0 +1,231 @@
+"""Anytime repair of a day's gate plan during irregular operations.
+
+The search starts from the current ``assigned_gate`` values, keeps every
+flight that still fits where it is, and then:
+
+1. re-inserts the flights that no longer fit: shift to a free stand, eject
+   a single blocking flight to another stand, or park on a hangar/ramp;
+2. until the wall-clock budget runs out, improves the plan with random
+   local moves (back to the planned gate, shift, swap two flights).
+
+A move is kept only if it lowers the plan cost. Unplaced flights dominate
+the cost, then gates changed away from ``planned_gate``, then remote
+parking, then the engine's total score. The best plan so far is always
+the current one, so stopping at any point returns a valid plan. Every
+improvement is logged as a (time, cost) point, at most one every
+``TRAJECTORY_INTERVAL_MS``.
+"""
+
+import random
+import time
+import numpy as np
+from gate_timeline import flight_interval
+
+DEFAULT_RECOVERY_BUDGET_MS = 2000
+
+UNPLACED_COST = 1000
+CHANGE_COST = 10
+REMOTE_COST = 5
+# Score points are worth much less than a gate change
+SCORE_WEIGHT = 0.01
+
+REMOTE_GATE_TYPES = ('hangar', 'ramp')
+
+# Minimum spacing of improvement points in the reported trajectory
+TRAJECTORY_INTERVAL_MS = 20
+
+# Stop early after this many consecutive moves without improvement
+MAX_STALE_MOVES = 2000
+
+
+class RecoverySearch:
+    def __init__(self, engine, run, flights, gates, seed=0):
+        self.occupancy = run.occupancy
+        self.flights = flights
+        self.by_id = {f.id: f for f in flights}
+        self.random = random.Random(seed)
+
+        ctx, self.feasible, _, self.total = engine._evaluate(run, flights, gates, dynamic=False)
+        self.row = {f.id: i for i, f in enumerate(ctx.flights)}
+        self.gates = ctx.gates
+        self.col = {g.gate_number: j for j, g in enumerate(ctx.gates)}
+        self.remote = np.array([g.gate_type in REMOTE_GATE_TYPES for g in ctx.gates], dtype=bool)
+        self.reference = {f.id: f.planned_gate or f.assigned_gate for f in flights}
+        self.current = {}
+
+        # Candidate gates per flight, cheapest first
+        self.candidates = {}
+        for flight_id, i in self.row.items():
+            options = np.flatnonzero(self.feasible[i])
+            self.candidates[flight_id] = sorted(
+                (self.gates[j].gate_number for j in options), key=lambda g: self.cost(flight_id, g)
+            )
+
+    def cost(self, flight_id, gate_number):
+        if gate_number is None:
+            return UNPLACED_COST
+        i, j = self.row[flight_id], self.col[gate_number]
+        cost = -SCORE_WEIGHT * self.total[i, j]
+        if gate_number != self.reference[flight_id]:
+            cost += CHANGE_COST
+        if self.remote[j]:
+            cost += REMOTE_COST
+        return cost
+
+    def plan_cost(self):
+        return sum(self.cost(f.id, self.current.get(f.id)) if f.id in self.row else UNPLACED_COST
+                   for f in self.flights)
+
+    def _fits(self, flight_id, gate_number):
+        j = self.col.get(gate_number)
+        if j is None or flight_id not in self.row or not self.feasible[self.row[flight_id], j]:
+            return False
+        return self.occupancy.fits(self.by_id[flight_id], self.gates[j])
+
+    def _place(self, flight_id, gate_number):
+        if gate_number is None:
+            self.occupancy.remove(flight_id)
+            self.current.pop(flight_id, None)
+        else:
+            self.occupancy.add(self.by_id[flight_id], self.gates[self.col[gate_number]])
+            self.current[flight_id] = gate_number
+
+    def _try(self, moves):
+        """Apply {flight_id: new gate} if every flight fits and the cost drops; else undo"""
+        before = {fid: self.current.get(fid) for fid in moves}
+        delta = sum(self.cost(fid, gate) - self.cost(fid, before[fid]) for fid, gate in moves.items())
+        if delta >= 0:
+            return False
+        for fid in moves:
+            self._place(fid, None)
+        for fid, gate in moves.items():
+            if gate is not None and not self._fits(fid, gate):
+                break
+            self._place(fid, gate)
+        else:
+            return True
+        for fid in moves:
+            self._place(fid, None)
+        for fid, gate in before.items():
+            if gate is not None:
+                self._place(fid, gate)
+        return False
+
+    def _best_free_gate(self, flight_id, exclude=()):
+        for gate_number in self.candidates.get(flight_id, ()):
+            if gate_number not in exclude and self._fits(flight_id, gate_number):
+                return gate_number
+        return None
+
+    def _shift(self, flight_id):
+        gate = self._best_free_gate(flight_id, exclude=(self.current.get(flight_id),))
+        return gate is not None and self._try({flight_id: gate})
+
+    def _eject(self, flight_id, gate_number):
+        """Move ``flight_id`` to ``gate_number`` by relocating its single blocker"""
+        j = self.col.get(gate_number)
+        if j is None or not self.feasible[self.row[flight_id], j]:
+            return False
+        blockers = self.occupancy.blocking(self.by_id[flight_id], self.gates[j])
+        if len(blockers) != 1 or blockers[0] not in self.row:
+            return False
+        other = blockers[0]
+        self._place(other, None)
+        target = self._best_free_gate(other, exclude=(gate_number,))
+        self._place(other, gate_number)
+        if target is None:
+            return False
+        return self._try({other: target, flight_id: gate_number})
+
+    def _swap(self, flight_id):
+        gate = self.current.get(flight_id)
+        candidates = [g for g in self.candidates.get(flight_id, ()) if g != gate]
+        if gate is None or not candidates:
+            return False
+        target = self.random.choice(candidates)
+        blockers = self.occupancy.blocking(self.by_id[flight_id], self.gates[self.col[target]])
+        if len(blockers) != 1 or blockers[0] not in self.row:
+            return False
+        return self._try({flight_id: target, blockers[0]: gate})
+
+    def _revert(self, flight_id):
+        reference = self.reference.get(flight_id)
+        if reference is None or reference == self.current.get(flight_id) or reference not in self.col:
+            return False
+        return self._try({flight_id: reference}) or self._eject(flight_id, reference)
+
+    def _insert(self, flight_id):
+        gate = self._best_free_gate(flight_id)
+        if gate is not None:
+            return self._try({flight_id: gate})
+        return any(self._eject(flight_id, g) for g in self.candidates.get(flight_id, ()))
+
+    def run(self, budget_ms=DEFAULT_RECOVERY_BUDGET_MS, started=None):
+        """Search until ``budget_ms`` after ``started`` (a perf_counter value, default now)"""
+        started = time.perf_counter() if started is None else started
+        deadline = started + budget_ms / 1000
+        trajectory = []
+
+        def record(phase):
+            unplaced = [f.id for f in self.flights if f.id not in self.current]
+            trajectory.append({
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+                'phase': phase,
+                'cost': round(self.plan_cost(), 2),
+                'unplaced': len(unplaced),
+                'changes_from_planned': sum(
+                    1 for fid, gate in self.current.items() if gate != self.reference.get(fid)
+                )
+            })
+
+        def start_time(flight):
+            interval = flight_interval(flight)
+            return (interval is None, interval[0] if interval else None)
+
+        # Keep everything that still fits where it is
+        ordered = sorted(self.flights, key=start_time)
+        for flight in ordered:
+            if flight.assigned_gate and self._fits(flight.id, flight.assigned_gate):
+                self._place(flight.id, flight.assigned_gate)
+        record('initial')
+
+        # Re-insert the displaced flights
+        for flight in ordered:
+            if time.perf_counter() >= deadline:
+                break
+            if flight.id not in self.current and flight.id in self.row:
+                self._insert(flight.id)
+        record('repair')
+
+        # Anytime improvement
+        moves = (self._revert, self._shift, self._swap)
+        movable = list(self.row)
+        iterations = stale = 0
+        while movable and stale < MAX_STALE_MOVES and time.perf_counter() < deadline:
+            iterations += 1
+            flight_id = self.random.choice(movable)
+            if flight_id not in self.current:
+                improved = self._insert(flight_id)
+            else:
+                improved = self.random.choice(moves)(flight_id)
+            if improved:
+                stale = 0
+                if (time.perf_counter() - started) * 1000 - trajectory[-1]['elapsed_ms'] >= TRAJECTORY_INTERVAL_MS:
+                    record('improve')
+            else:
+                stale += 1
+
+        record('final')
+        unplaced = [f.id for f in self.flights if f.id not in self.current]
+        return {
+            'gates': dict(self.current),
+            'cost': trajectory[-1]['cost'],
+            'unplaced': unplaced,
+            'changes_from_planned': trajectory[-1]['changes_from_planned'],
+            'remote_parked': sum(1 for gate in self.current.values() if self.remote[self.col[gate]]),
+            'iterations': iterations,
+            'converged': stale >= MAX_STALE_MOVES,
+            'budget_ms': budget_ms,
+            'elapsed_ms': trajectory[-1]['elapsed_ms'],
+            'trajectory': trajectory
+        }
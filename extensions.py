@@ -1,3 +1,18 @@
+import contextvars
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+# Engine of the airport selected for the current request (None: default database)
+airport_bind = contextvars.ContextVar('airport_bind', default=None)
+
+
+class AirportSession(Session):
+    """Session that sends every statement to the selected airport's database"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            bind = airport_bind.get()
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={'class_': AirportSession})
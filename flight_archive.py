@@ -0,0 +1,149 @@
+import csv
+import gzip
+import os
+from datetime import datetime, timedelta
+from models import Flight, Recommendation, PassengerConnection
+from sqlalchemy import or_
+from extensions import db
+from data_integration import FLIGHT_FIELDS
+
+DEFAULT_RETENTION_DAYS = 30
+
+DEFAULT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'flight_archive')
+
+
+def retention_cutoff(retention_days):
+    """First day kept when keeping ``retention_days`` days, counted from today in UTC"""
+    return datetime.utcnow().date() - timedelta(days=int(retention_days))
+
+
+def airport_archive_dir(code=None, archive_dir=None):
+    """Archive root for airport ``code``; the shared root only when no airport is set"""
+    archive_dir = archive_dir or os.getenv('FLIGHT_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR)
+    return os.path.join(archive_dir, code.lower()) if code else archive_dir
+
+
+def _row_key(record):
+    # Ids repeat across databases; created_at tells two flights with one id apart
+    return str(record['id']), record['created_at'] or ''
+
+
+def _format_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+class FlightArchive:
+    """Moves past days out of the live ``flights`` table into per-day archives.
+
+    Each day is one gzip-compressed CSV partition at
+    ``<archive_dir>/YYYY/MM/flights-YYYY-MM-DD.csv.gz``, so a history query
+    over a date range opens only the partitions for those days.
+    """
+
+    def __init__(self, archive_dir=None, retention_days=None):
+        self.archive_dir = archive_dir or os.getenv('FLIGHT_ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR)
+        self.retention_days = int(retention_days or os.getenv('FLIGHT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+
+    def partition_path(self, day):
+        return os.path.join(
+            self.archive_dir, f'{day.year:04d}', f'{day.month:02d}', f'flights-{day.isoformat()}.csv.gz'
+        )
+
+    def _read_partition(self, day):
+        path = self.partition_path(day)
+        if not os.path.exists(path):
+            return []
+        with gzip.open(path, 'rt', newline='') as f:
+            return [
+                {k: (v if v != '' else None) for k, v in row.items()}
+                for row in csv.DictReader(f)
+            ]
+
+    def _write_partition(self, day, rows):
+        """Write (merging with any existing partition) via a temp file and rename"""
+        by_key = {_row_key(r): r for r in self._read_partition(day)}
+        for row in rows:
+            record = {field: _format_value(v) for field, v in zip(FLIGHT_FIELDS, row)}
+            by_key[_row_key(record)] = record
+
+        path = self.partition_path(day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with gzip.open(tmp_path, 'wt', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=FLIGHT_FIELDS)
+            writer.writeheader()
+            for record in by_key.values():
+                writer.writerow({k: ('' if v is None else v) for k, v in record.items()})
+        os.replace(tmp_path, path)
+        return path
+
+    def archive_before(self, cutoff=None):
+        """Archive and delete every flight scheduled before ``cutoff`` (a date).
+
+        Defaults to keeping a rolling window of ``retention_days``. Each day is
+        written to disk before its rows are deleted, one transaction per day.
+        """
+        if cutoff is None:
+            cutoff = retention_cutoff(self.retention_days)
+
+        days = [
+            d for (d,) in db.session.query(Flight.scheduled_date)
+            .filter(Flight.scheduled_date < cutoff)
+            .distinct().order_by(Flight.scheduled_date.asc())
+        ]
+
+        archived = 0
+        partitions = []
+        columns = [getattr(Flight, field) for field in FLIGHT_FIELDS]
+        for day in days:
+            try:
+                rows = db.session.query(*columns).filter(Flight.scheduled_date == day).all()
+                partitions.append(self._write_partition(day, rows))
+
+                ids = db.session.query(Flight.id).filter(Flight.scheduled_date == day).scalar_subquery()
+                Recommendation.query.filter(Recommendation.flight_id.in_(ids)).delete(synchronize_session=False)
+                PassengerConnection.query.filter(or_(
+                    PassengerConnection.inbound_flight_id.in_(ids),
+                    PassengerConnection.outbound_flight_id.in_(ids)
+                )).delete(synchronize_session=False)
+                Flight.query.filter(Flight.scheduled_date == day).delete(synchronize_session=False)
+                db.session.commit()
+                archived += len(rows)
+            except Exception:
+                db.session.rollback()
+                raise
+
+        return {
+            'cutoff': cutoff.isoformat(),
+            'archived_flights': archived,
+            'archived_days': len(days),
+            'partitions': partitions
+        }
+
+    def query_range(self, start, end):
+        """Flights scheduled in [start, end] from both the live table and the archive.
+
+        Live rows use the indexed ``scheduled_date`` range; archived days are
+        read only from partitions inside the range.
+        """
+        live = Flight.query.filter(
+            Flight.scheduled_date >= start, Flight.scheduled_date <= end
+        ).order_by(Flight.scheduled_date.asc(), Flight.scheduled_time.asc()).all()
+        flights = [flight.to_dict() for flight in live]
+        live_ids = {f['id'] for f in flights}
+
+        day = start
+        while day <= end:
+            for record in self._read_partition(day):
+                record['id'] = int(record['id'])
+                if record['id'] not in live_ids:
+                    record['archived'] = True
+                    flights.append(record)
+            day += timedelta(days=1)
+
+        flights.sort(key=lambda f: (f['scheduled_date'] or '', f['scheduled_time'] or ''))
+        return flights
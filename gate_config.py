@@ -0,0 +1,21 @@
+from sqlalchemy import func
+from models import Gate, AirportConfig
+from extensions import db
+
+
+def config_version(*config_keys):
+    """Cheap fingerprint of the gate catalogue plus the given AirportConfig keys.
+
+    Anything precomputed from gate configuration (distance tables, rule masks)
+    compares this against the version it was built from instead of reloading
+    on every request.
+    """
+    gate_count, gates_updated = db.session.query(func.count(Gate.id), func.max(Gate.updated_at)).one()
+    configs = ()
+    if config_keys:
+        configs = tuple(sorted(
+            (key, updated.isoformat() if updated else None)
+            for key, updated in db.session.query(AirportConfig.config_key, AirportConfig.updated_at)
+            .filter(AirportConfig.config_key.in_(config_keys))
+        ))
+    return (gate_count, gates_updated.isoformat() if gates_updated else None) + configs
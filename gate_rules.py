@@ -0,0 +1,226 @@
+import json
+import re
+import threading
+import numpy as np
+from models import AirportConfig
+from records import load_gates
+from gate_config import config_version
+
+RULES_CONFIG_KEY = 'gate_rules'
+
+# ICAO aerodrome reference codes by wingspan, smallest first
+ICAO_CODES = 'ABCDEF'
+DEFAULT_AIRCRAFT_CODES = {'narrow_body': 'C', 'wide_body': 'E'}
+
+# Score points deducted when an airline parks outside its preferred concourses
+DEFAULT_PREFERENCE_PENALTY = 10
+
+_AIRLINE_PATTERN = re.compile(r'^([A-Z]{3}|[A-Z0-9]{2})(?=\d)')
+
+
+def airline_of(flight_number):
+    """Airline designator from a flight number ('BA123' -> 'BA', 'DLH400' -> 'DLH')"""
+    match = _AIRLINE_PATTERN.match((flight_number or '').strip().upper())
+    return match.group(1) if match else ''
+
+
+def _code_rank(code):
+    return ICAO_CODES.index(code) if code and code in ICAO_CODES else None
+
+
+class GateRules:
+    """Airline, aircraft size and Schengen rules compiled against the gate catalogue.
+
+    Rules come from the ``gate_rules`` AirportConfig entry (JSON)::
+
+        {"aircraft_codes": {"narrow_body": "C", "wide_body": "E", "A388": "F"},
+         "gate_max_code": {"A1": "C", "B": "E"},
+         "airline_concourses": {"BA": {"required": ["B"]}, "AA": {"preferred": ["A"]}},
+         "preference_penalty": 10,
+         "schengen": {"airlines": ["LH", "AF"], "flights": ["BA304"],
+                      "gates": {"A": "schengen", "B": "non_schengen", "C1": "swing"}},
+         "mars": {"M1": {"substands": ["M1L", "M1R"], "substand_max_code": "C"}},
+         "adjacency": [{"gate": "A2", "neighbours": ["A1", "A3"],
+                        "min_code": "E", "neighbour_max_code": "C"}]}
+
+    ``gate_max_code`` and the Schengen ``gates`` map accept a gate number, a
+    concourse or a terminal, most specific first. A MARS parent takes the
+    large aircraft and its sub-stands are capped at ``substand_max_code``.
+    Gates without a Schengen flag (or flagged ``swing``) take both kinds of
+    flight.
+
+    Flights are reduced to a category (airline, ICAO code, Schengen). Each
+    category gets one row of hard-constraint mask and one row of preference
+    penalties over all gates, built the first time the category is seen and
+    kept until the config version changes. A flights x gates mask is then a
+    row gather.
+
+    ``adjacency`` rules couple neighbouring stands over time: while an
+    aircraft of at least ``min_code`` (any, if omitted) is on ``gate``, its
+    neighbours only take aircraft up to ``neighbour_max_code`` (nothing, if
+    omitted). A MARS parent and its sub-stands always exclude each other.
+    These compile to conflict sets per (gate, ICAO code); aircraft with an
+    unknown code count as the smallest.
+    """
+
+    def __init__(self, gates, rules=None, version=None):
+        self.version = version
+        rules = rules or {}
+        self.gate_index = {g.gate_number: j for j, g in enumerate(gates)}
+        self.aircraft_codes = dict(DEFAULT_AIRCRAFT_CODES, **rules.get('aircraft_codes', {}))
+        self.airline_concourses = rules.get('airline_concourses', {})
+        self.preference_penalty = float(rules.get('preference_penalty', DEFAULT_PREFERENCE_PENALTY))
+
+        schengen = rules.get('schengen', {})
+        self.schengen_airlines = set(schengen.get('airlines', []))
+        self.schengen_flights = {f.upper() for f in schengen.get('flights', [])}
+
+        def resolve(mapping, gate):
+            for key in (gate.gate_number, gate.concourse, gate.terminal):
+                if key and key in mapping:
+                    return mapping[key]
+            return None
+
+        n_gates = len(gates)
+        self.gate_groups = [{g.concourse, g.terminal} - {None, ''} for g in gates]
+
+        # Largest ICAO code rank each gate accepts (len(ICAO_CODES) = no limit)
+        self.gate_max_rank = np.full(n_gates, len(ICAO_CODES), dtype=np.int8)
+        limits = rules.get('gate_max_code', {})
+        for j, gate in enumerate(gates):
+            rank = _code_rank(resolve(limits, gate))
+            if rank is not None:
+                self.gate_max_rank[j] = rank
+        for parent, mars in rules.get('mars', {}).items():
+            rank = _code_rank(mars.get('substand_max_code'))
+            if rank is None:
+                continue
+            for substand in mars.get('substands', []):
+                j = self.gate_index.get(substand)
+                if j is not None:
+                    self.gate_max_rank[j] = min(self.gate_max_rank[j], rank)
+
+        # Schengen zone per gate: 1 schengen, 0 non-schengen, -1 either
+        zones = {'schengen': 1, 'non_schengen': 0}
+        self.gate_zone = np.array([
+            zones.get(resolve(schengen.get('gates', {}), g), -1) for g in gates
+        ], dtype=np.int8)
+
+        self.conflict_sets = self._compile_adjacency(rules)
+
+        self._lock = threading.Lock()
+        self._categories = {}
+        self._masks = np.ones((0, n_gates), dtype=bool)
+        self._penalties = np.zeros((0, n_gates))
+
+    def _compile_adjacency(self, rules):
+        ranks = range(len(ICAO_CODES))
+        pairs = []
+        for rule in rules.get('adjacency', []):
+            min_rank = _code_rank(rule.get('min_code')) or 0
+            max_rank = _code_rank(rule.get('neighbour_max_code'))
+            shadowing = frozenset(r for r in ranks if r >= min_rank)
+            blocked = frozenset(r for r in ranks if max_rank is None or r > max_rank)
+            for neighbour in rule.get('neighbours', []):
+                pairs.append((rule['gate'], neighbour, shadowing, blocked))
+        for parent, mars in rules.get('mars', {}).items():
+            for substand in mars.get('substands', []):
+                pairs.append((parent, substand, frozenset(ranks), frozenset(ranks)))
+
+        # conflict_sets[gate][rank] = {neighbour: ranks that may not overlap there}
+        conflict_sets = {}
+        for gate, neighbour, gate_ranks, neighbour_ranks in pairs:
+            for a, b, own, other in ((gate, neighbour, gate_ranks, neighbour_ranks),
+                                     (neighbour, gate, neighbour_ranks, gate_ranks)):
+                by_rank = conflict_sets.setdefault(a, {})
+                for rank in own:
+                    entry = by_rank.setdefault(rank, {})
+                    entry[b] = entry.get(b, frozenset()) | other
+        return conflict_sets
+
+    def has_conflicts(self, gate_number):
+        return gate_number in self.conflict_sets
+
+    def conflicts(self, gate_number, rank):
+        """{neighbour gate: ICAO ranks that may not overlap there} for an aircraft at ``gate_number``"""
+        return self.conflict_sets.get(gate_number, {}).get(rank or 0, {})
+
+    def category(self, flight):
+        airline = airline_of(flight.flight_number)
+        rank = _code_rank(self.aircraft_codes.get(flight.aircraft_type or ''))
+        number = (flight.flight_number or '').strip().upper()
+        is_schengen = number in self.schengen_flights or airline in self.schengen_airlines
+        return airline, rank, is_schengen
+
+    def _compile(self, category):
+        airline, rank, is_schengen = category
+        mask = np.ones(len(self.gate_index), dtype=bool)
+        if rank is not None:
+            mask &= self.gate_max_rank >= rank
+        mask &= (self.gate_zone < 0) | (self.gate_zone == int(is_schengen))
+
+        penalty = np.zeros(len(self.gate_index))
+        concourses = self.airline_concourses.get(airline, {})
+        required = set(concourses.get('required', []))
+        if required:
+            mask &= np.array([bool(groups & required) for groups in self.gate_groups], dtype=bool)
+        preferred = set(concourses.get('preferred', []))
+        if preferred:
+            outside = np.array([not (groups & preferred) for groups in self.gate_groups], dtype=bool)
+            penalty[outside] = self.preference_penalty
+        return mask, penalty
+
+    def _category_rows(self, flights):
+        categories = [self.category(f) for f in flights]
+        with self._lock:
+            new = [c for c in dict.fromkeys(categories) if c not in self._categories]
+            if new:
+                compiled = [self._compile(c) for c in new]
+                for c in new:
+                    self._categories[c] = len(self._categories)
+                self._masks = np.vstack([self._masks] + [m[None, :] for m, _ in compiled])
+                self._penalties = np.vstack([self._penalties] + [p[None, :] for _, p in compiled])
+            return np.array([self._categories[c] for c in categories], dtype=int), self._masks, self._penalties
+
+    def _columns(self, gates):
+        return np.array([self.gate_index.get(g.gate_number, -1) for g in gates], dtype=int)
+
+    def mask(self, flights, gates):
+        """Hard constraints: True where the flight may use the gate"""
+        rows, masks, _ = self._category_rows(flights)
+        cols = self._columns(gates)
+        result = masks[rows][:, np.maximum(cols, 0)] if len(masks) else np.ones((len(flights), len(gates)), bool)
+        result[:, cols < 0] = True
+        return result
+
+    def penalties(self, flights, gates):
+        """Soft preferences: score points to deduct per flight x gate"""
+        rows, _, penalties = self._category_rows(flights)
+        cols = self._columns(gates)
+        result = penalties[rows][:, np.maximum(cols, 0)] if len(penalties) else np.zeros((len(flights), len(gates)))
+        result[:, cols < 0] = 0
+        return result
+
+
+class GateRulesCache:
+    """Holds the compiled GateRules, recompiling when gate config changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._rules = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def current(self):
+        version = config_version(RULES_CONFIG_KEY)
+        with self._lock:
+            if self._rules is None or version != self._version:
+                config = AirportConfig.query.filter_by(config_key=RULES_CONFIG_KEY).first()
+                rules = json.loads(config.config_value) if config and config.config_value else None
+                gates = sorted(load_gates(), key=lambda g: g.gate_number)
+                self._rules = GateRules(gates, rules, version)
+                self._version = version
+            return self._rules
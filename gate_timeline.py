@@ -0,0 +1,217 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func
+from models import Flight, Gate
+from extensions import db
+
+# Gate occupancy assumed when a flight has no off-block (or in-block) time yet
+DEFAULT_OCCUPANCY_MINUTES = 45
+
+EPOCH = datetime(1970, 1, 1)
+
+# updated_at is stamped when a writer flushes, not when it commits, so a row
+# can become visible after newer ones. Each sync re-reads this far below the
+# watermark; keep it above the longest write transaction (e.g. a big upload).
+DEFAULT_SYNC_OVERLAP_SECONDS = 300
+
+
+def to_epoch(value):
+    """Convert a naive (UTC) or aware datetime to integer epoch seconds"""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((value - EPOCH).total_seconds())
+
+
+def flight_interval(flight, default_minutes=DEFAULT_OCCUPANCY_MINUTES):
+    """Return the (start, end) datetimes a flight occupies its gate.
+
+    Arrivals start at in-block (actual, estimated) or landing time and end at
+    off-block; departures are anchored on off-block and extend backwards.
+    The scheduled date/time fills in whichever side is unknown.
+    """
+    duration = timedelta(minutes=default_minutes)
+    scheduled = None
+    if flight.scheduled_date and flight.scheduled_time:
+        scheduled = datetime.combine(flight.scheduled_date, flight.scheduled_time)
+
+    start = flight.aibt or flight.eibt or flight.eldt
+    end = flight.aobt or flight.tobt
+
+    if flight.flight_type == 'departure':
+        end = end or scheduled
+        if end is None:
+            return None
+        start = start or end - duration
+    else:
+        start = start or scheduled
+        if start is None:
+            return None
+        end = end or start + duration
+
+    if end <= start:
+        end = start + duration
+    return start, end
+
+
+class GateTimeline:
+    """Precomputed per-gate occupancy intervals for Gantt-style views.
+
+    Intervals are kept sorted by start time per gate and brought up to date
+    incrementally from ``Flight.updated_at``, so a windowed slice is a pair of
+    bisects per gate instead of a scan over every flight. Each sync re-reads
+    an overlap window below the newest ``updated_at`` seen, which catches
+    rows committed late by other writers.
+
+    Deletes leave no ``updated_at`` behind, so every slice checks the cached
+    flights in its window against the database and drops the ones that are
+    gone. Each worker process therefore sees deletions and archiving done by
+    any other, without being told.
+    """
+
+    # Only these columns are needed to place a flight on the timeline
+    _columns = (
+        Flight.id, Flight.flight_number, Flight.flight_type, Flight.status,
+        Flight.assigned_gate, Flight.scheduled_date, Flight.scheduled_time,
+        Flight.aibt, Flight.eibt, Flight.eldt, Flight.aobt, Flight.tobt,
+        Flight.updated_at
+    )
+
+    # Flight ids per IN (...) query when checking which cached flights still exist
+    _id_chunk = 500
+
+    def __init__(self, sync_overlap_seconds=None):
+        self.sync_overlap = timedelta(seconds=int(
+            sync_overlap_seconds or os.getenv('TIMELINE_SYNC_OVERLAP_SECONDS', DEFAULT_SYNC_OVERLAP_SECONDS)
+        ))
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # gate_number -> sorted list of (start, end, flight_id)
+        self.intervals = {}
+        # gate_number -> longest interval, bounds how far back a slice looks
+        self.max_duration = {}
+        # flight_id -> (gate_number, start, end, flight_number, status)
+        self.flights = {}
+        self.watermark = None
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def sync(self):
+        """Apply flights inserted or changed since the last sync"""
+        with self._lock:
+            count, last_update = db.session.query(
+                func.count(Flight.id), func.max(Flight.updated_at)
+            ).one()
+
+            if count and last_update is None:
+                self._reset()
+
+            query = db.session.query(*self._columns)
+            if self.watermark is not None:
+                # Upserts are idempotent, so re-reading the overlap is harmless
+                query = query.filter(Flight.updated_at >= self.watermark - self.sync_overlap)
+
+            for row in query.yield_per(1000):
+                self._upsert(row)
+                if row.updated_at and (self.watermark is None or row.updated_at > self.watermark):
+                    self.watermark = row.updated_at
+
+            # More cached than live flights: some are gone, free them now
+            # rather than waiting for a slice over their window
+            if len(self.flights) > count:
+                self._drop_deleted(list(self.flights))
+
+    def _drop_deleted(self, flight_ids):
+        """Remove the cached flights among ``flight_ids`` that no longer exist"""
+        live = set()
+        for i in range(0, len(flight_ids), self._id_chunk):
+            chunk = flight_ids[i:i + self._id_chunk]
+            live.update(fid for (fid,) in db.session.query(Flight.id).filter(Flight.id.in_(chunk)))
+        for flight_id in set(flight_ids) - live:
+            self._remove(flight_id)
+
+    def _overlapping(self, gate_number, start, end):
+        """Cached (start, end, flight_id) intervals on a gate overlapping [start, end)"""
+        gate_intervals = self.intervals.get(gate_number)
+        if not gate_intervals:
+            return []
+        # Anything starting before start - max_duration has already ended
+        lo = bisect_left(gate_intervals, (start - self.max_duration.get(gate_number, 0),))
+        hi = bisect_right(gate_intervals, (end,))
+        return [(s, e, fid) for s, e, fid in gate_intervals[lo:hi] if e > start and s < end]
+
+    def _remove(self, flight_id):
+        entry = self.flights.pop(flight_id, None)
+        if not entry:
+            return
+        gate_number, start, end = entry[0], entry[1], entry[2]
+        gate_intervals = self.intervals.get(gate_number, [])
+        idx = bisect_left(gate_intervals, (start, end, flight_id))
+        if idx < len(gate_intervals) and gate_intervals[idx] == (start, end, flight_id):
+            gate_intervals.pop(idx)
+
+    def _upsert(self, flight):
+        self._remove(flight.id)
+        if not flight.assigned_gate or flight.status == 'cancelled':
+            return
+
+        interval = flight_interval(flight)
+        if interval is None:
+            return
+        start, end = to_epoch(interval[0]), to_epoch(interval[1])
+
+        insort(self.intervals.setdefault(flight.assigned_gate, []), (start, end, flight.id))
+        self.max_duration[flight.assigned_gate] = max(
+            self.max_duration.get(flight.assigned_gate, 0), end - start
+        )
+        self.flights[flight.id] = (flight.assigned_gate, start, end, flight.flight_number, flight.status)
+
+    def slice(self, start, end, gate_from=None, gate_to=None):
+        """Return occupancy in [start, end) for gates in [gate_from, gate_to] as columns.
+
+        ``start``/``end`` are epoch seconds. Gates are listed in gate_number order
+        (including idle ones so Gantt rows stay stable) and each interval refers
+        to its gate by index into ``gates``.
+        """
+        self.sync()
+
+        gate_numbers = [
+            g for (g,) in db.session.query(Gate.gate_number).order_by(Gate.gate_number.asc())
+        ]
+        with self._lock:
+            known = set(gate_numbers)
+            # Flights can sit on stands that are not (or no longer) configured
+            gate_numbers.extend(sorted(g for g in self.intervals if g not in known and self.intervals[g]))
+            gate_numbers = [
+                g for g in gate_numbers
+                if (gate_from is None or g >= gate_from) and (gate_to is None or g <= gate_to)
+            ]
+
+            self._drop_deleted([
+                fid for gate_number in gate_numbers for _, _, fid in self._overlapping(gate_number, start, end)
+            ])
+
+            columns = {'gate': [], 'flight_id': [], 'flight_number': [], 'start': [], 'end': [], 'status': []}
+            for gate_idx, gate_number in enumerate(gate_numbers):
+                for s, e, flight_id in self._overlapping(gate_number, start, end):
+                    entry = self.flights[flight_id]
+                    columns['gate'].append(gate_idx)
+                    columns['flight_id'].append(flight_id)
+                    columns['flight_number'].append(entry[3])
+                    columns['start'].append(s)
+                    columns['end'].append(e)
+                    columns['status'].append(entry[4])
+
+        return {
+            'gates': gate_numbers,
+            'window': [start, end],
+            'count': len(columns['flight_id']),
+            'columns': columns
+        }
@@ -0,0 +1,43 @@
+"""Gunicorn settings for serving the API with multiple workers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Every value can be overridden from the environment (see .env.example).
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5001')}")
+
+# Processes give CPU-bound scoring real parallelism; threads per worker keep
+# reads flowing while another request in the same worker waits on the DB.
+workers = int(os.getenv('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = 'gthread'
+threads = int(os.getenv('WORKER_THREADS', 4))
+
+# Large uploads and whole-day recommendation runs can take a while
+timeout = int(os.getenv('WORKER_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Optionally recycle workers to cap memory growth from big uploads (0 = never)
+max_requests = int(os.getenv('WORKER_MAX_REQUESTS', 0))
+max_requests_jitter = max_requests // 10
+
+# Each worker opens its own connection pool after fork
+preload_app = False
+
+accesslog = '-'
+errorlog = '-'
+
+
+def on_starting(server):
+    """Create tables once in the master before workers start"""
+    from db_bootstrap import create_db_app
+    from extensions import db
+    import models  # noqa: F401  registers the tables
+
+    app = create_db_app()
+    with app.app_context():
+        db.create_all()
@@ -7,12 +7,13 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app import app
+from db_bootstrap import create_db_app
 from extensions import db
 from data_integration import DataIntegration
 
 def initialize_system():
     """Initialize the system with default configuration and gate data"""
+    app = create_db_app()
     with app.app_context():
         print("Creating database tables...")
         db.create_all()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Check that /api/flights reads keep flowing while /api/upload is writing.
+
+Starts several reader threads polling GET /api/flights, measures a quiet
+baseline, then posts a generated CSV upload and reports reader latency while
+the upload runs. Requires the backend to be running, e.g.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+    python load_test.py --rows 20000 --readers 8
+"""
+
+import argparse
+import csv
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+
+
+def make_upload_file(rows):
+    tmp = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='')
+    writer = csv.writer(tmp)
+    writer.writerow([
+        'flight_number', 'scheduled_date', 'scheduled_time', 'aircraft_registration',
+        'aircraft_type', 'assigned_gate', 'planned_gate', 'flight_type', 'status'
+    ])
+    start = date.today() + timedelta(days=365)
+    for i in range(rows):
+        day = start + timedelta(days=i // 1000)
+        minute = (i * 7) % 1440
+        writer.writerow([
+            f'LT{i}', day.isoformat(), f'{minute // 60:02d}:{minute % 60:02d}', f'N{i:05d}T',
+            'wide_body' if i % 5 == 0 else 'narrow_body', 'A1', 'A1',
+            'arrival' if i % 2 else 'departure', 'scheduled'
+        ])
+    tmp.close()
+    return tmp.name
+
+
+def reader(base_url, stop, samples):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            session.get(f'{base_url}/api/flights', timeout=60).raise_for_status()
+            samples.append(time.perf_counter() - start)
+        except requests.RequestException as e:
+            samples.append(float('inf'))
+            print(f'read failed: {e}')
+
+
+def run_readers(base_url, readers, until):
+    stop = threading.Event()
+    samples = []
+    threads = [threading.Thread(target=reader, args=(base_url, stop, samples)) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    until()
+    stop.set()
+    for t in threads:
+        t.join()
+    return samples
+
+
+def summarize(label, samples):
+    ok = sorted(s for s in samples if s != float('inf'))
+    failed = len(samples) - len(ok)
+    if not ok:
+        print(f'{label:<16} no successful reads ({failed} failed)')
+        return
+    p95 = ok[min(len(ok) - 1, int(len(ok) * 0.95))]
+    print(f'{label:<16} reads={len(ok):<6} p50={statistics.median(ok) * 1000:7.1f}ms '
+          f'p95={p95 * 1000:7.1f}ms max={ok[-1] * 1000:7.1f}ms failed={failed}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent read/upload load test')
+    parser.add_argument('--base-url', default='http://localhost:5001')
+    parser.add_argument('--rows', type=int, default=20000, help='rows in the generated upload')
+    parser.add_argument('--readers', type=int, default=8, help='concurrent reader threads')
+    parser.add_argument('--baseline-seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    path = make_upload_file(args.rows)
+    try:
+        baseline = run_readers(args.base_url, args.readers, lambda: time.sleep(args.baseline_seconds))
+
+        upload_result = {}
+
+        def upload():
+            start = time.perf_counter()
+            with open(path, 'rb') as f:
+                resp = requests.post(f'{args.base_url}/api/upload', files={'file': ('load.csv', f)}, timeout=600)
+            upload_result['status'] = resp.status_code
+            upload_result['seconds'] = time.perf_counter() - start
+
+        during = run_readers(args.base_url, args.readers, upload)
+
+        summarize('baseline', baseline)
+        summarize('during upload', during)
+        print(f"upload: HTTP {upload_result.get('status')} in {upload_result.get('seconds', 0):.1f}s "
+              f'({args.rows} rows)')
+    finally:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,42 @@
+import json
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from extensions import db
 
+def flight_to_dict(flight):
+    """Flight.to_dict for anything with the flight columns (ORM instance or row)"""
+    return {
+        'id': flight.id,
+        'flight_number': flight.flight_number,
+        'scheduled_date': flight.scheduled_date.isoformat() if flight.scheduled_date else None,
+        'scheduled_time': flight.scheduled_time.isoformat() if flight.scheduled_time else None,
+        'aircraft_registration': flight.aircraft_registration,
+        'aircraft_type': flight.aircraft_type,
+        'new_position': flight.new_position,
+        'old_position': flight.old_position,
+        'assigned_gate': flight.assigned_gate,
+        'planned_gate': flight.planned_gate,
+        'aldt': flight.aldt.isoformat() if flight.aldt else None,
+        'aibt': flight.aibt.isoformat() if flight.aibt else None,
+        'eldt': flight.eldt.isoformat() if flight.eldt else None,
+        'eibt': flight.eibt.isoformat() if flight.eibt else None,
+        'aobt': flight.aobt.isoformat() if flight.aobt else None,
+        'atot': flight.atot.isoformat() if flight.atot else None,
+        'tobt': flight.tobt.isoformat() if flight.tobt else None,
+        'ttot': flight.ttot.isoformat() if flight.ttot else None,
+        'flight_type': flight.flight_type,
+        'status': flight.status,
+        'created_at': flight.created_at.isoformat(),
+        'updated_at': flight.updated_at.isoformat()
+    }
+
+
 class Flight(db.Model):
     __tablename__ = 'flights'
     
     id = db.Column(db.Integer, primary_key=True)
     flight_number = db.Column(db.String(20), nullable=False)
-    scheduled_date = db.Column(db.Date, nullable=False)
+    scheduled_date = db.Column(db.Date, nullable=False, index=True)
     scheduled_time = db.Column(db.Time, nullable=False)
     aircraft_registration = db.Column(db.String(20))
     aircraft_type = db.Column(db.String(50))  # 'wide_body' or 'narrow_body'
@@ -25,7 +54,7 @@ class Flight(db.Model):
     eibt = db.Column(db.DateTime)  # Estimated In-Block Time
     
     # Departure times
-    aobt = db.Column(db.DateTime)  # Actual Off-Block Time
+    aobt = db.Column(db.DateTime, index=True)  # Actual Off-Block Time
     atot = db.Column(db.DateTime)  # Actual Take-off Time
     tobt = db.Column(db.DateTime)  # Target Off-Block Time
     ttot = db.Column(db.DateTime)  # Target Take-off Time
@@ -36,33 +65,11 @@ class Flight(db.Model):
     
     # Metadata
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Indexed for the timeline's and turnaround model's incremental reads
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     def to_dict(self):
-        return {
-            'id': self.id,
-            'flight_number': self.flight_number,
-            'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
-            'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
-            'aircraft_registration': self.aircraft_registration,
-            'aircraft_type': self.aircraft_type,
-            'new_position': self.new_position,
-            'old_position': self.old_position,
-            'assigned_gate': self.assigned_gate,
-            'planned_gate': self.planned_gate,
-            'aldt': self.aldt.isoformat() if self.aldt else None,
-            'aibt': self.aibt.isoformat() if self.aibt else None,
-            'eldt': self.eldt.isoformat() if self.eldt else None,
-            'eibt': self.eibt.isoformat() if self.eibt else None,
-            'aobt': self.aobt.isoformat() if self.aobt else None,
-            'atot': self.atot.isoformat() if self.atot else None,
-            'tobt': self.tobt.isoformat() if self.tobt else None,
-            'ttot': self.ttot.isoformat() if self.ttot else None,
-            'flight_type': self.flight_type,
-            'status': self.status,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
-        }
+        return flight_to_dict(self)
 
 class Gate(db.Model):
     __tablename__ = 'gates'
@@ -127,7 +134,8 @@ class Recommendation(db.Model):
     
     # Relationships
     flight = db.relationship('Flight', backref='recommendations')
-    gate = db.relationship('Gate', backref='recommendations')
+    # Joined eagerly: to_dict reads gate_number for every row
+    gate = db.relationship('Gate', backref='recommendations', lazy='joined')
     
     def to_dict(self):
         return {
@@ -143,6 +151,118 @@ class Recommendation(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+class RecommendationRun(db.Model):
+    """One compact snapshot of a recommendation run (see recommendation_history.py)"""
+    __tablename__ = 'recommendation_runs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # First run of the delta chain this run belongs to (its own id for keyframes)
+    keyframe_id = db.Column(db.Integer, index=True)
+    is_keyframe = db.Column(db.Boolean, default=False)
+    # Run this delta was encoded against (None for keyframes)
+    base_run_id = db.Column(db.Integer)
+    
+    flight_count = db.Column(db.Integer, default=0)
+    changed_count = db.Column(db.Integer, default=0)
+    top_k = db.Column(db.Integer)
+    weights = db.Column(db.Text)  # JSON
+    components = db.Column(db.Text)  # JSON list, order of the score columns
+    payload = db.Column(db.LargeBinary)  # zlib-compressed JSON
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'keyframe_id': self.keyframe_id,
+            'is_keyframe': self.is_keyframe,
+            'base_run_id': self.base_run_id,
+            'flight_count': self.flight_count,
+            'changed_count': self.changed_count,
+            'top_k': self.top_k,
+            'weights': json.loads(self.weights) if self.weights else {},
+            'components': json.loads(self.components) if self.components else [],
+            'bytes': len(self.payload) if self.payload else 0,
+            'created_at': self.created_at.isoformat()
+        }
+
+class PassengerConnection(db.Model):
+    __tablename__ = 'passenger_connections'
+    __table_args__ = (
+        db.UniqueConstraint('inbound_flight_id', 'outbound_flight_id', name='uq_passenger_connection'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    inbound_flight_id = db.Column(db.Integer, db.ForeignKey('flights.id'), nullable=False, index=True)
+    outbound_flight_id = db.Column(db.Integer, db.ForeignKey('flights.id'), nullable=False, index=True)
+    passengers = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Metadata
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'inbound_flight_id': self.inbound_flight_id,
+            'outbound_flight_id': self.outbound_flight_id,
+            'passengers': self.passengers,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class TurnaroundStat(db.Model):
+    __tablename__ = 'turnaround_stats'
+    __table_args__ = (
+        db.UniqueConstraint('gate_number', 'aircraft_type', 'hour_of_day', name='uq_turnaround_stat'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    gate_number = db.Column(db.String(20), nullable=False)
+    aircraft_type = db.Column(db.String(50), nullable=False)
+    hour_of_day = db.Column(db.Integer, nullable=False)  # in-block hour, 0-23
+    
+    # Running aggregates of actual in-block -> off-block minutes
+    sample_count = db.Column(db.Integer, default=0)
+    total_minutes = db.Column(db.Float, default=0)
+    
+    # Metadata
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'gate_number': self.gate_number,
+            'aircraft_type': self.aircraft_type,
+            'hour_of_day': self.hour_of_day,
+            'sample_count': self.sample_count,
+            'mean_minutes': self.total_minutes / self.sample_count if self.sample_count else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class TurnaroundSample(db.Model):
+    """One flight's contribution to ``turnaround_stats``, as last folded.
+
+    Refolding a flight whose actuals changed subtracts this contribution
+    before adding the new one. Rows outlive archived flights, so their
+    stats are kept.
+    """
+    __tablename__ = 'turnaround_samples'
+    
+    flight_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    flight_number = db.Column(db.String(20))
+    scheduled_date = db.Column(db.Date)
+    
+    # Bucket and minutes counted; minutes is None when the actuals were unusable
+    gate_number = db.Column(db.String(20))
+    aircraft_type = db.Column(db.String(50))
+    hour_of_day = db.Column(db.Integer)
+    minutes = db.Column(db.Float)
+    
+    # Flight.updated_at of the version that was folded
+    folded_at = db.Column(db.DateTime, nullable=False)
+
 class AirportConfig(db.Model):
     __tablename__ = 'airport_config'
     
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Plan gate assignments for a schedule file offline, without the database.
+
+Reads a flight schedule (CSV or Parquet, same columns as the upload
+template) and a gate config JSON file, runs the whole-day solver in memory
+and writes one row per flight with its gate and score breakdown:
+
+    python plan_schedule.py schedule.csv gates.json -o plan.csv
+    python plan_schedule.py season.parquet gates.json -o plan.parquet --workers 8
+
+The gate config file holds a ``gates`` list (as in GET/POST /api/config)
+and, optionally, ``gate_rules``, ``terminal_layout`` and
+``gate_buffer_minutes`` objects. The {"config": ..., "gates": ...} document
+returned by GET /api/config works as is. Each day is solved on its own, so
+days run in parallel with ``--workers``. Parquet files need pyarrow.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from upload_validation import validate_frame, number_rows
+
+CONFIG_KEYS = ('gate_rules', 'terminal_layout', 'gate_buffer_minutes')
+GATE_FIELDS = (
+    'gate_number', 'gate_type', 'max_aircraft', 'aircraft_types', 'terminal', 'concourse',
+    'coordinates_x', 'coordinates_y', 'is_active', 'maintenance_status'
+)
+
+
+def read_schedule(path):
+    """Schedule rows indexed by source row number (header is row 1)"""
+    if path.lower().endswith('.parquet'):
+        return number_rows(pd.read_parquet(path), 2)
+    return number_rows(pd.read_csv(path, dtype=str, skip_blank_lines=False), 2)
+
+
+def read_gate_config(path):
+    """(gate dicts, {config key: parsed value}) from a gate config JSON file"""
+    with open(path) as f:
+        document = json.load(f)
+    gates = document.get('gates', [])
+    config = {}
+    for key in CONFIG_KEYS:
+        value = document.get(key)
+        if value is None and isinstance(document.get('config', {}).get(key), dict):
+            value = document['config'][key].get('config_value')
+        if isinstance(value, str):
+            value = json.loads(value) if value else None
+        config[key] = value
+    return gates, config
+
+
+def _build_gates(gate_dicts):
+    from records import gate_record
+    gates = []
+    for i, g in enumerate(gate_dicts):
+        values = {k: g.get(k) for k in GATE_FIELDS if k in g}
+        if isinstance(values.get('aircraft_types'), list):
+            values['aircraft_types'] = ','.join(values['aircraft_types'])
+        values.setdefault('max_aircraft', 1)
+        values.setdefault('is_active', True)
+        values.setdefault('maintenance_status', 'available')
+        gates.append(gate_record(dict(values, id=i + 1)))
+    return gates
+
+
+def _plan_day(job):
+    """Solve one day in a fresh engine; returns (day, output rows, component names, seconds)"""
+    day, flight_values, gate_dicts, config, keep_assigned = job
+    from records import flight_record
+    from recommendation_engine import RecommendationEngine
+    from stand_capacity import DEFAULT_BUFFER_MINUTES
+
+    started = time.perf_counter()
+    gates = _build_gates(gate_dicts)
+    flights = [flight_record(dict(values, assigned_gate=values.get('assigned_gate') or None))
+               for values in flight_values]
+    fixed = [f for f in flights if keep_assigned and f.assigned_gate]
+    fixed_ids = {f.id for f in fixed}
+    movable = [f for f in flights if f.id not in fixed_ids]
+
+    buffers = {k: dict(v) for k, v in DEFAULT_BUFFER_MINUTES.items()}
+    for gate_type, values in (config.get('gate_buffer_minutes') or {}).items():
+        buffers.setdefault(gate_type, {'pre': 0, 'post': 0}).update(values)
+
+    engine = RecommendationEngine()
+    run = engine.prepare_in_memory(
+        gates, flights, fixed,
+        layout=config.get('terminal_layout'), rules=config.get('gate_rules'), buffers=buffers
+    )
+    assignments = engine.assign_greedy(run, movable, [g for g in gates if g.is_active and g.maintenance_status == 'available'])
+
+    components = list(engine.registry.components)
+    rows = []
+    for flight in flights:
+        placed = assignments.get(flight.id)
+        if flight.id in fixed_ids:
+            placed = {'gate_number': flight.assigned_gate, 'total_score': None, 'scores': {}}
+        row = {
+            'flight_number': flight.flight_number,
+            'scheduled_date': flight.scheduled_date.isoformat(),
+            'scheduled_time': flight.scheduled_time.strftime('%H:%M'),
+            'aircraft_type': flight.aircraft_type,
+            'flight_type': flight.flight_type,
+            'previous_gate': flight.assigned_gate,
+            'gate_number': placed['gate_number'] if placed else None,
+            'total_score': placed['total_score'] if placed else None,
+        }
+        for name in components:
+            value = placed['scores'].get(name) if placed else None
+            row[f'score_{name}'] = round(value, 2) if value is not None else None
+        rows.append(row)
+    return day, rows, components, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline batch gate planning for a schedule file')
+    parser.add_argument('schedule', help='flight schedule (.csv or .parquet)')
+    parser.add_argument('gate_config', help='gate config JSON (gates plus optional rules/layout/buffers)')
+    parser.add_argument('-o', '--output', default='plan.csv', help='output file (.csv or .parquet)')
+    parser.add_argument('--workers', type=int, default=1, help='days solved in parallel (default 1)')
+    parser.add_argument('--keep-assigned', action='store_true',
+                        help='treat flights with an assigned_gate as fixed instead of re-planning them')
+    args = parser.parse_args()
+
+    gate_dicts, config = read_gate_config(args.gate_config)
+    if not gate_dicts:
+        parser.error('gate config has no gates')
+
+    schedule = read_schedule(args.schedule)
+    values, errors, warnings = validate_frame(
+        schedule, {g['gate_number'] for g in gate_dicts}, row_numbers=schedule.index
+    )
+    for row, column, reason in errors[:20]:
+        print(f'row {row}: {column}: {reason}', file=sys.stderr)
+    if errors:
+        print(f'{len(errors)} problems; rows with errors were skipped', file=sys.stderr)
+    print(f'{len(values)} flights, {len(gate_dicts)} gates, {len(warnings)} warnings')
+
+    by_day = {}
+    for i, flight in enumerate(values):
+        flight['id'] = i + 1
+        by_day.setdefault(flight['scheduled_date'], []).append(flight)
+    jobs = [(day, flights, gate_dicts, config, args.keep_assigned) for day, flights in sorted(by_day.items())]
+
+    started = time.perf_counter()
+    if args.workers > 1 and len(jobs) > 1:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as pool:
+            results = list(pool.map(_plan_day, jobs))
+    else:
+        results = [_plan_day(job) for job in jobs]
+
+    rows = [row for _, day_rows, _, _ in results for row in day_rows]
+    for day, day_rows, _, seconds in results:
+        placed = sum(1 for r in day_rows if r['gate_number'])
+        print(f'{day}: {placed}/{len(day_rows)} flights placed in {seconds:.2f}s')
+
+    plan = pd.DataFrame(rows)
+    if args.output.lower().endswith('.parquet'):
+        plan.to_parquet(args.output, index=False)
+    else:
+        plan.to_csv(args.output, index=False)
+
+    unplaced = int(plan['gate_number'].isna().sum()) if len(plan) else 0
+    print(f'Wrote {len(plan)} rows to {args.output} ({unplaced} unplaced) '
+          f'in {time.perf_counter() - started:.2f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+"""Opt-in request profiling and per-stage timing spans.
+
+Spans: code wraps ingest and engine stages in ``span('upload.insert')``.
+Inside a request the durations are summed per name and returned in a
+``Server-Timing`` header. Outside a request (CLI, tests) spans cost nothing.
+
+Captures: a request is profiled when
+
+- it sends ``X-Profile: cprofile`` or ``X-Profile: sample`` and
+  ``PROFILE_ALLOW_HEADER=1``; or
+- ``PROFILE_SLOW_MS`` is set. Every request is then stack-sampled, and the
+  samples are kept only if the request took at least that long.
+
+cProfile captures are saved as ``.prof`` files (pstats, snakeviz). Stack
+samples are saved as ``.folded`` files, one ``frame;frame;frame count``
+line per stack, which flamegraph.pl and speedscope read directly. The
+metadata sits next to each file and is served by ``/api/profiles``.
+"""
+
+import contextvars
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'profiles')
+DEFAULT_MAX_PROFILES = 100
+SAMPLE_INTERVAL_SECONDS = 0.005
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ID_PATTERN = re.compile(r'^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$')
+
+_spans = contextvars.ContextVar('profiling_spans', default=None)
+
+
+@contextmanager
+def span(name):
+    """Time a block under ``name`` for the current request, if any"""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        total, count = spans.get(name, (0.0, 0))
+        spans[name] = (total + (time.perf_counter() - started) * 1000, count + 1)
+
+
+def timed_iter(name, iterable):
+    """Yield from ``iterable``, counting the time spent producing items as a span"""
+    iterator = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def current_spans():
+    """{name: {ms, count}} recorded so far in this request"""
+    spans = _spans.get() or {}
+    return {name: {'ms': round(total, 2), 'count': count} for name, (total, count) in spans.items()}
+
+
+class StackSampler:
+    """One background thread sampling the stacks of the threads being captured;
+    it waits without waking while nothing is captured"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL_SECONDS):
+        self.interval = interval
+        # Notified when a capture starts; the thread sleeps on it while idle
+        self._lock = threading.Condition()
+        self._targets = {}
+        self._thread = None
+
+    def start(self, ident):
+        counter = Counter()
+        with self._lock:
+            self._targets[ident] = counter
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+                self._thread.start()
+            self._lock.notify()
+        return counter
+
+    def stop(self, ident):
+        with self._lock:
+            return self._targets.pop(ident, Counter())
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._targets:
+                    self._lock.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                frames = sys._current_frames()
+                for ident, counter in self._targets.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        counter[self._fold(frame)] += 1
+
+
+class ProfileStore:
+    """Profile files plus JSON metadata in one directory, newest ``max_profiles`` kept"""
+
+    def __init__(self, directory=None, max_profiles=None):
+        self.directory = directory or os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+        self.max_profiles = int(max_profiles or os.getenv('PROFILE_MAX_FILES', DEFAULT_MAX_PROFILES))
+        self._lock = threading.Lock()
+
+    def save(self, extension, write, meta):
+        profile_id = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(self.directory, exist_ok=True)
+        filename = f'{profile_id}.{extension}'
+        write(os.path.join(self.directory, filename))
+        meta = dict(meta, id=profile_id, file=filename)
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w') as f:
+            json.dump(meta, f)
+        self._prune()
+        return profile_id
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        items = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith('.json'):
+                with open(os.path.join(self.directory, name)) as f:
+                    items.append(json.load(f))
+        return items
+
+    def path(self, profile_id):
+        """(file path, metadata) for a stored profile, or None"""
+        if not PROFILE_ID_PATTERN.match(profile_id or ''):
+            return None
+        meta_path = os.path.join(self.directory, f'{profile_id}.json')
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return os.path.join(self.directory, meta['file']), meta
+
+    def _prune(self):
+        with self._lock:
+            metas = sorted(n for n in os.listdir(self.directory) if n.endswith('.json'))
+            for name in metas[:max(len(metas) - self.max_profiles, 0)]:
+                profile_id = name[:-len('.json')]
+                for entry in os.listdir(self.directory):
+                    if entry.startswith(profile_id + '.'):
+                        os.remove(os.path.join(self.directory, entry))
+
+
+def init_profiling(app, store=None):
+    """Install the span collector and the opt-in profiler around every request"""
+    from flask import g, request
+
+    store = store or ProfileStore()
+    sampler = StackSampler()
+    allow_header = os.getenv('PROFILE_ALLOW_HEADER', '0').lower() in ('1', 'true', 'yes')
+    slow_ms = float(os.getenv('PROFILE_SLOW_MS', '0') or 0)
+
+    @app.before_request
+    def _start_profiling():
+        g._profiling_spans_token = _spans.set({})
+        g._profiling_started = time.perf_counter()
+
+        mode = request.headers.get(PROFILE_HEADER, '').strip().lower() if allow_header else ''
+        g._profiling_trigger = 'header' if mode in ('cprofile', 'sample') else None
+        if g._profiling_trigger is None and slow_ms > 0:
+            mode, g._profiling_trigger = 'sample', 'threshold'
+        g._profiling_mode = mode if g._profiling_trigger else None
+
+        if g._profiling_mode == 'cprofile':
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+        elif g._profiling_mode == 'sample':
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _finish_profiling(response):
+        started = g.pop('_profiling_started', None)
+        if started is None:
+            return response
+        duration_ms = (time.perf_counter() - started) * 1000
+        mode, trigger = g.pop('_profiling_mode', None), g.pop('_profiling_trigger', None)
+
+        capture = None
+        if mode == 'cprofile':
+            profiler = g.pop('_profiler')
+            profiler.disable()
+            capture = ('prof', profiler.dump_stats)
+        elif mode == 'sample':
+            samples = sampler.stop(threading.get_ident())
+            if trigger == 'header' or duration_ms >= slow_ms:
+                def write_folded(path, samples=samples):
+                    with open(path, 'w') as f:
+                        for stack, count in samples.most_common():
+                            f.write(f'{stack} {count}\n')
+                capture = ('folded', write_folded)
+
+        spans = current_spans()
+        if capture:
+            extension, write = capture
+            profile_id = store.save(extension, write, {
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 2),
+                'mode': mode,
+                'trigger': trigger,
+                'spans': spans,
+                'created_at': datetime.utcnow().isoformat()
+            })
+            response.headers['X-Profile-Id'] = profile_id
+
+        timings = [f'{name.replace(".", "-")};dur={value["ms"]}' for name, value in spans.items()]
+        timings.append(f'total;dur={duration_ms:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.teardown_request
+    def _reset_spans(exc=None):
+        token = g.pop('_profiling_spans_token', None)
+        if token is not None:
+            _spans.reset(token)
+        # after_request is skipped when the view raises; never leave a profiler running
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        if g.pop('_profiling_mode', None) == 'sample':
+            sampler.stop(threading.get_ident())
+
+    return store
@@ -1,9 +1,40 @@
-import pandas as pd
+import threading
+import time
 import numpy as np
-from datetime import datetime, timedelta
-from models import Flight, Gate, Recommendation
+from contextlib import nullcontext
+from datetime import timedelta
+from models import Flight, Recommendation, PassengerConnection
 from extensions import db
-from sqlalchemy import and_, or_
+from sqlalchemy import or_, insert
+from records import load_flights, load_gates, save_assigned_gates
+from turnaround_model import TurnaroundModel
+from terminal_layout import TerminalLayout, TerminalLayoutCache
+from gate_rules import GateRules, GateRulesCache
+from recommendation_history import RecommendationHistory
+from disruption_recovery import RecoverySearch, DEFAULT_RECOVERY_BUDGET_MS
+from connections import ConnectionMatrix
+from stand_capacity import StandCapacity, StandOccupancy, DEFAULT_BUFFER_MINUTES, load_buffer_minutes
+from gate_timeline import flight_interval
+from scoring import ScoringContext, default_registry, compatibility_matrix
+from profiling import span
+
+class RunContext:
+    """Stand, rule and connection state of one engine run.
+
+    Built per call by ``_prepare`` or ``prepare_in_memory`` and passed down,
+    so concurrent runs on a shared engine never see each other's occupancy.
+    ``timings`` holds the component wall times (ms) of the run's last
+    evaluation.
+    """
+
+    def __init__(self, gates, layout, rules, connections, capacity, occupancy):
+        self.gates = gates
+        self.layout = layout
+        self.rules = rules
+        self.connections = connections
+        self.capacity = capacity
+        self.occupancy = occupancy
+        self.timings = {}
 
 class RecommendationEngine:
     def __init__(self):
@@ -12,195 +43,302 @@ class RecommendationEngine:
             'turnaround': 0.3,
             'distance': 0.2
         }
+        # Score points deducted per connecting passenger put at risk of
+        # missing the minimum connection time, and per passenger-km walked
+        self.connection_weights = {
+            'missed_passenger': 1.0,
+            'transfer_km': 0.5
+        }
+        # Scoring components; extra ones can be registered on this registry
+        self.registry = default_registry()
+        self.history = RecommendationHistory()
+        self.turnaround_model = TurnaroundModel()
+        self.terminal_layouts = TerminalLayoutCache()
+        self.gate_rules = GateRulesCache()
+        # Held from loading the day to saving it by runs that apply their plan
+        self._apply_lock = threading.Lock()
     
     def generate_recommendations(self, flight_ids):
-        recommendations = []
+        """Score and save gates for ``flight_ids``; returns {recommendations, run_id, timings}"""
+        with span('engine.load'):
+            day_flights = self._load_day_flights(flight_ids)
+            run = self._prepare(
+                day_flights,
+                [f for f in day_flights if f.assigned_gate and f.status in ('scheduled', 'delayed')]
+            )
         
-        for flight_id in flight_ids:
-            flight = Flight.query.get(flight_id)
-            if not flight:
-                continue
+        by_id = {f.id: f for f in day_flights}
+        flights = [by_id[i] for i in dict.fromkeys(flight_ids) if i in by_id]
+        gates = [g for g in run.gates if g.is_active and g.maintenance_status == 'available']
+        
+        with span('engine.score'):
+            recommendations = self._score(run, flights, gates)
             
-            # Get available gates
-            available_gates = self._get_available_gates(flight)
+            # Sort by total score (descending)
+            recommendations.sort(key=lambda x: x['total_score'], reverse=True)
+        
+        # Save to database, and keep a compact snapshot of the run
+        with span('engine.persist'):
+            self._save_recommendations(recommendations)
+            run_id = self.history.record(recommendations, self.effective_weights()) if recommendations else None
+        
+        return {'recommendations': recommendations, 'run_id': run_id, 'timings': run.timings}
+    
+    def effective_weights(self):
+        """Weight of every scoring component in use, plus the connection weights"""
+        weights = {
+            name: self.optimization_weights.get(name, component.weight)
+            for name, component in self.registry.components.items()
+        }
+        weights.update({f'connection_{k}': v for k, v in self.connection_weights.items()})
+        return weights
+    
+    def solve_day(self, day, apply=False):
+        """Assign every open flight of ``day`` in one greedy pass.
+        
+        Flights already on stand (in-block recorded) and flights of the
+        neighbouring days keep their gates. The rest are placed in order of
+        their start time on the best-scoring gate that still has room and no
+        adjacency conflict. With ``apply`` the new gates are saved.
+        """
+        started = time.perf_counter()
+        with self._applying(apply):
+            run, movable, gates = self._prepare_day(day)
+            assignments = self.assign_greedy(run, movable, gates)
             
-            # Calculate scores for each gate
-            for gate in available_gates:
-                scores = self._calculate_gate_scores(flight, gate)
-                total_score = self._calculate_total_score(scores)
-                
-                recommendation = {
-                    'flight_id': flight_id,
-                    'gate_id': gate.id,
-                    'gate_number': gate.gate_number,
-                    'scores': scores,
-                    'total_score': total_score
-                }
-                recommendations.append(recommendation)
+            placed = [
+                {'flight_id': f.id, 'flight_number': f.flight_number, 'gate_number': assignments[f.id]['gate_number'],
+                 'previous_gate': f.assigned_gate, 'total_score': assignments[f.id]['total_score']}
+                for f in movable if f.id in assignments
+            ]
+            unassigned = [f.id for f in movable if f.id not in assignments]
+            changed = [f for f in movable if f.id in assignments and f.assigned_gate != assignments[f.id]['gate_number']]
+            if apply and changed:
+                save_assigned_gates({f.id: assignments[f.id]['gate_number'] for f in changed})
         
-        # Sort by total score (descending)
-        recommendations.sort(key=lambda x: x['total_score'], reverse=True)
+        return {
+            'date': day.isoformat(),
+            'assignments': placed,
+            'unassigned': unassigned,
+            'changed': len(changed),
+            'applied': bool(apply),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+            'timings': run.timings
+        }
+    
+    def recover_day(self, day, budget_ms=DEFAULT_RECOVERY_BUDGET_MS, apply=False, seed=0):
+        """Anytime repair of the current plan for ``day`` (see disruption_recovery.py).
         
-        # Save to database
-        self._save_recommendations(recommendations)
+        The budget counts from this call, loading included. Flights the
+        search could not place are listed in ``unplaced`` and keep their
+        current gate when the plan is applied.
+        """
+        started = time.perf_counter()
+        with self._applying(apply):
+            run, movable, gates = self._prepare_day(day)
+            result = RecoverySearch(self, run, movable, gates, seed=seed).run(budget_ms, started=started)
+            
+            changed = [f for f in movable if f.id in result['gates'] and result['gates'][f.id] != f.assigned_gate]
+            plan = [
+                {'flight_id': f.id, 'flight_number': f.flight_number, 'planned_gate': f.planned_gate,
+                 'previous_gate': f.assigned_gate, 'gate_number': result['gates'].get(f.id)}
+                for f in movable
+            ]
+            if apply and changed:
+                save_assigned_gates({f.id: result['gates'][f.id] for f in changed})
         
-        return recommendations
+        return {
+            'date': day.isoformat(),
+            'plan': plan,
+            'moved': len(changed),
+            'applied': bool(apply),
+            **{k: v for k, v in result.items() if k != 'gates'}
+        }
+    
+    def _applying(self, apply):
+        """Serialize runs that save their plan, so each one plans from the
+        gates the previous one saved; read-only runs go in parallel"""
+        return self._apply_lock if apply else nullcontext()
+    
+    def _prepare_day(self, day):
+        """Load ``day`` and build the run state. Flights already on stand and
+        flights of the neighbouring days are fixed occupants; returns the
+        run context, the open flights of the day and the usable gates."""
+        day_flights = self._load_day_flights_for_dates({day})
+        movable = [
+            f for f in day_flights
+            if f.scheduled_date == day and f.status in ('scheduled', 'delayed') and f.aibt is None
+        ]
+        movable_ids = {f.id for f in movable}
+        fixed = [
+            f for f in day_flights
+            if f.id not in movable_ids and f.assigned_gate and f.status in ('scheduled', 'delayed')
+        ]
+        run = self._prepare(day_flights, fixed)
+        return run, movable, [g for g in run.gates if g.is_active and g.maintenance_status == 'available']
     
-    def _get_available_gates(self, flight):
-        current_time = datetime.utcnow()
+    def assign_greedy(self, run, flights, gates):
+        """Place flights one at a time, in start-time order, on the best-scoring
+        gate that still has room and no adjacency conflict.
         
-        # Get gates that are compatible with aircraft type
-        compatible_gates = Gate.query.filter(
-            Gate.is_active == True,
-            Gate.maintenance_status == 'available',
-            Gate.aircraft_types.like(f'%{flight.aircraft_type}%')
-        ).all()
+        Uses (and updates) the occupancy of ``run``, as built by ``_prepare``
+        or ``prepare_in_memory``. Returns {flight_id: {gate_number,
+        total_score, scores}} for the flights that could be placed.
+        """
+        ctx, feasible, matrices, total = self._evaluate(run, flights, gates, dynamic=False)
+        scores = np.where(feasible, total, -np.inf)
         
-        available_gates = []
-        
-        for gate in compatible_gates:
-            # Check if gate is available during flight's time window
-            if self._is_gate_available(gate, flight, current_time):
-                available_gates.append(gate)
-        
-        return available_gates
-    
-    def _is_gate_available(self, gate, flight, current_time):
-        # Get conflicting flights at this gate
-        conflicting_flights = Flight.query.filter(
-            Flight.assigned_gate == gate.gate_number,
-            Flight.id != flight.id,
-            Flight.status.in_(['scheduled', 'delayed']),
-            or_(
-                and_(
-                    Flight.scheduled_date == flight.scheduled_date,
-                    # Check time overlap (simplified - would need more sophisticated logic)
-                    Flight.flight_type == flight.flight_type
-                )
-            )
-        ).all()
+        def start_key(i):
+            interval = flight_interval(ctx.flights[i])
+            return (interval is None, interval[0] if interval else None, int(feasible[i].sum()))
         
-        # For hangars/ramps that can accommodate multiple aircraft
-        if gate.gate_type in ['hangar', 'ramp'] and gate.max_aircraft > 1:
-            current_aircraft_count = len(conflicting_flights)
-            return current_aircraft_count < gate.max_aircraft
-        
-        # For regular gates - only one aircraft allowed
-        return len(conflicting_flights) == 0
-    
-    def _calculate_gate_scores(self, flight, gate):
-        scores = {}
-        
-        # Compatibility score (0-100)
-        scores['compatibility'] = self._calculate_compatibility_score(flight, gate)
-        
-        # Turnaround time score (0-100)
-        scores['turnaround'] = self._calculate_turnaround_score(flight, gate)
-        
-        # Passenger walking distance score (0-100)
-        scores['distance'] = self._calculate_distance_score(flight, gate)
-        
-        return scores
-    
-    def _calculate_compatibility_score(self, flight, gate):
-        # Base compatibility from aircraft type
-        if flight.aircraft_type in gate.aircraft_types.split(','):
-            base_score = 100
-        else:
-            return 0  # Incompatible
-        
-        # Adjust for gate type
-        if gate.gate_type == 'gate':
-            return base_score
-        elif gate.gate_type == 'ramp':
-            return base_score * 0.9  # Slightly less preferred than gates
-        elif gate.gate_type == 'hangar':
-            return base_score * 0.8  # Least preferred for passenger flights
-        
-        return base_score * 0.7  # Unknown gate type
-    
-    def _calculate_turnaround_score(self, flight, gate):
-        # Simplified turnaround time calculation
-        # In reality, this would consider ground handling equipment availability,
-        # taxiway distance, etc.
-        
-        if gate.gate_type == 'gate':
-            # Gates typically have fastest turnaround
-            base_turnaround = 30  # minutes
-        elif gate.gate_type == 'ramp':
-            base_turnaround = 35
-        elif gate.gate_type == 'hangar':
-            base_turnaround = 45
-        else:
-            base_turnaround = 40
-        
-        # Score based on how fast the turnaround is (lower is better)
-        # Normalize to 0-100 scale
-        min_turnaround = 25
-        max_turnaround = 60
-        
-        if base_turnaround <= min_turnaround:
-            return 100
-        elif base_turnaround >= max_turnaround:
-            return 0
-        else:
-            # Linear interpolation
-            score = 100 * (max_turnaround - base_turnaround) / (max_turnaround - min_turnaround)
-            return max(0, min(100, score))
-    
-    def _calculate_distance_score(self, flight, gate):
-        # Simplified passenger walking distance calculation
-        # In reality, this would consider terminal layout, connecting flights, etc.
-        
-        if not gate.coordinates_x or not gate.coordinates_y:
-            # Default score if coordinates not available
-            return 50
-        
-        # Assume terminal center at (0,0) for simplicity
-        terminal_center_x, terminal_center_y = 0, 0
-        
-        # Calculate distance from terminal center
-        distance = np.sqrt(
-            (gate.coordinates_x - terminal_center_x) ** 2 + 
-            (gate.coordinates_y - terminal_center_y) ** 2
+        assignments = {}
+        for i in sorted(range(len(ctx.flights)), key=start_key):
+            flight = ctx.flights[i]
+            for j in np.argsort(-scores[i], kind='stable'):
+                if not feasible[i, j]:
+                    break
+                gate = ctx.gates[j]
+                if run.occupancy.fits(flight, gate):
+                    run.occupancy.add(flight, gate)
+                    assignments[flight.id] = {
+                        'gate_number': gate.gate_number,
+                        'total_score': round(float(total[i, j]), 2),
+                        'scores': {name: float(values[i, j]) for name, values in matrices.items()}
+                    }
+                    break
+        return assignments
+    
+    def _prepare(self, day_flights, occupants):
+        """Refresh models and build the run context (stand and connection state)"""
+        self.turnaround_model.refresh_if_stale()
+        layout = self.terminal_layouts.current()
+        rules = self.gate_rules.current()
+        connections = self._load_connections(day_flights, layout)
+        all_gates = load_gates()
+        buffers = load_buffer_minutes()
+        return RunContext(
+            all_gates, layout, rules, connections,
+            StandCapacity(all_gates, occupants, buffers),
+            StandOccupancy(all_gates, rules, occupants, buffers)
         )
-        
-        # Score based on distance (closer is better)
-        # Normalize to 0-100 scale
-        max_distance = 1000  # meters
-        
-        if distance <= 0:
-            return 100
-        elif distance >= max_distance:
-            return 0
-        else:
-            score = 100 * (1 - distance / max_distance)
-            return max(0, min(100, score))
-    
-    def _calculate_total_score(self, scores):
-        total = (
-            scores['compatibility'] * self.optimization_weights['compatibility'] +
-            scores['turnaround'] * self.optimization_weights['turnaround'] +
-            scores['distance'] * self.optimization_weights['distance']
+    
+    def prepare_in_memory(self, gates, flights, occupants=(), layout=None, rules=None, buffers=None,
+                          connections=()):
+        """Build the run context from plain objects and config dicts, without
+        the database (used by the batch planner). Turnaround scores fall back
+        to the per gate type defaults."""
+        layout = TerminalLayout(gates, layout)
+        rules = GateRules(gates, rules)
+        buffers = buffers or DEFAULT_BUFFER_MINUTES
+        return RunContext(
+            gates, layout, rules, ConnectionMatrix(flights, connections, layout),
+            StandCapacity(gates, occupants, buffers),
+            StandOccupancy(gates, rules, occupants, buffers)
         )
-        return round(total, 2)
+    
+    def _score(self, run, flights, gates):
+        """Recommendation dicts for every feasible flight x gate pair"""
+        ctx, feasible, matrices, total = self._evaluate(run, flights, gates)
+        recommendations = []
+        for i, j in zip(*np.nonzero(feasible)):
+            flight, gate = ctx.flights[i], ctx.gates[j]
+            recommendations.append({
+                'flight_id': flight.id,
+                'gate_id': gate.id,
+                'gate_number': gate.gate_number,
+                'scores': {name: float(values[i, j]) for name, values in matrices.items()},
+                'total_score': round(float(total[i, j]), 2)
+            })
+        return recommendations
+    
+    def _evaluate(self, run, flights, gates, dynamic=True):
+        """Evaluate the registry over the feasible part of flights x gates.
+        
+        Returns the pruned context, its feasibility mask, the component
+        matrices and the total score matrix.
+        """
+        ctx = ScoringContext(flights, gates, {
+            'layout': run.layout,
+            'turnaround_model': self.turnaround_model,
+            'connections': run.connections,
+            'connection_weights': self.connection_weights,
+            'rules': run.rules
+        })
+        
+        # Hard constraints first: aircraft type accepted, airline/size/Schengen
+        # rules, then (unless the caller tracks occupancy itself) room on the
+        # stand and no adjacency conflict with its neighbours. Flights and
+        # gates without any feasible pair are dropped before scoring runs.
+        feasible = compatibility_matrix(ctx) & run.rules.mask(flights, gates)
+        ctx, feasible = self._prune(ctx, feasible)
+        if dynamic:
+            feasible &= run.capacity.fits_matrix(ctx.flights, ctx.gates)
+            for j, gate in enumerate(ctx.gates):
+                if run.rules.has_conflicts(gate.gate_number):
+                    for i in np.flatnonzero(feasible[:, j]):
+                        feasible[i, j] = run.occupancy.adjacency_ok(ctx.flights[i], gate)
+            ctx, feasible = self._prune(ctx, feasible)
+        if not feasible.size:
+            run.timings = {}
+            return ctx, feasible, {}, np.zeros(feasible.shape)
+        
+        matrices, total, run.timings = self.registry.evaluate(ctx, self.optimization_weights)
+        return ctx, feasible, matrices, total
+    
+    def _prune(self, ctx, feasible):
+        """Drop flights and gates that have no feasible pair left"""
+        rows = np.flatnonzero(feasible.any(axis=1))
+        cols = np.flatnonzero(feasible.any(axis=0))
+        return ctx.take(rows, cols), feasible[np.ix_(rows, cols)]
+    
+    def _load_day_flights(self, flight_ids):
+        """All flights on the requested flights' days, plus neighbouring days
+        for connections and stand occupancy across midnight"""
+        dates = {d for (d,) in db.session.query(Flight.scheduled_date).filter(Flight.id.in_(flight_ids))}
+        return self._load_day_flights_for_dates(dates)
+    
+    def _load_day_flights_for_dates(self, dates):
+        if not dates:
+            return []
+        window = {d + timedelta(days=k) for d in dates for k in (-1, 0, 1)}
+        return load_flights(Flight.scheduled_date.in_(window))
+    
+    def _load_connections(self, day_flights, layout):
+        """Connection costs for every flight of the planning window"""
+        if not day_flights:
+            return ConnectionMatrix([], [], layout)
+        
+        dates = {f.scheduled_date for f in day_flights}
+        day_ids = db.session.query(Flight.id).filter(Flight.scheduled_date.in_(dates)).scalar_subquery()
+        links = db.session.query(
+            PassengerConnection.inbound_flight_id,
+            PassengerConnection.outbound_flight_id,
+            PassengerConnection.passengers
+        ).filter(
+            or_(PassengerConnection.inbound_flight_id.in_(day_ids),
+                PassengerConnection.outbound_flight_id.in_(day_ids))
+        ).all()
+        return ConnectionMatrix(day_flights, links, layout)
     
     def _save_recommendations(self, recommendations):
         # Clear existing recommendations for these flights
         flight_ids = [rec['flight_id'] for rec in recommendations]
         Recommendation.query.filter(Recommendation.flight_id.in_(flight_ids)).delete()
         
-        # Save new recommendations
-        for rec in recommendations:
-            recommendation = Recommendation(
-                flight_id=rec['flight_id'],
-                gate_id=rec['gate_id'],
-                compatibility_score=rec['scores']['compatibility'],
-                turnaround_score=rec['scores']['turnaround'],
-                distance_score=rec['scores']['distance'],
-                total_score=rec['total_score']
-            )
-            db.session.add(recommendation)
+        # Save new recommendations in one bulk insert
+        if recommendations:
+            db.session.execute(insert(Recommendation), [
+                {
+                    'flight_id': rec['flight_id'],
+                    'gate_id': rec['gate_id'],
+                    'compatibility_score': rec['scores']['compatibility'],
+                    'turnaround_score': rec['scores']['turnaround'],
+                    'distance_score': rec['scores']['distance'],
+                    'total_score': rec['total_score']
+                }
+                for rec in recommendations
+            ])
         
         db.session.commit()
     
@@ -0,0 +1,191 @@
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from models import RecommendationRun
+from extensions import db
+
+# Gates kept per flight in a snapshot
+DEFAULT_TOP_K = 5
+
+# A full snapshot is written every this many runs; runs in between only
+# store the flights whose top-K changed
+KEYFRAME_INTERVAL = 20
+
+DEFAULT_RETENTION_DAYS = 7
+
+# Retention is enforced once every this many runs
+PRUNE_EVERY = 50
+
+
+def _encode(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def _decode(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8')) if blob else {}
+
+
+class RecommendationHistory:
+    """Versioned, compact snapshots of recommendation runs.
+
+    A run keeps the top-K gates per scored flight as rows of
+    ``[gate_number, total_score, <component scores...>]``, plus the weights
+    used. Runs are delta encoded: a keyframe stores every flight it scored,
+    and the following runs store only the flights whose top-K changed since
+    their base run (the latest run when they were recorded) and list the
+    rest as unchanged. Every delta names its base, so runs recorded
+    concurrently by different workers stay decodable. Rebuilding any run
+    reads at most ``KEYFRAME_INTERVAL`` rows. Retention removes whole chains
+    older than ``retention_days``.
+    """
+
+    def __init__(self, top_k=None, retention_days=None, keyframe_interval=KEYFRAME_INTERVAL):
+        self.top_k = int(top_k or os.getenv('RECOMMENDATION_TOP_K', DEFAULT_TOP_K))
+        self.retention_days = int(
+            retention_days or os.getenv('RECOMMENDATION_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+        )
+        self.keyframe_interval = keyframe_interval
+
+    def record(self, recommendations, weights):
+        """Store a run; ``recommendations`` are the engine's dicts. Returns the run id."""
+        components = sorted({name for rec in recommendations for name in rec['scores']})
+        by_flight = {}
+        for rec in sorted(recommendations, key=lambda r: r['total_score'], reverse=True):
+            rows = by_flight.setdefault(rec['flight_id'], [])
+            if len(rows) < self.top_k:
+                rows.append([rec['gate_number'], rec['total_score']] +
+                            [round(rec['scores'].get(name, 0.0), 2) for name in components])
+
+        # Read the base and insert the delta in one transaction; the delta is
+        # always against the run it names, whichever worker wrote that run
+        try:
+            latest = RecommendationRun.query.order_by(RecommendationRun.id.desc()).first()
+            keyframe = (
+                latest is None or
+                latest.id - latest.keyframe_id + 1 >= self.keyframe_interval or
+                json.loads(latest.components or '[]') != components
+            )
+            state = {} if keyframe else self._chain_state(latest)
+
+            changed = {fid: rows for fid, rows in by_flight.items() if state.get(fid) != rows}
+            unchanged = sorted(fid for fid in by_flight if fid not in changed)
+
+            run = RecommendationRun(
+                is_keyframe=keyframe,
+                keyframe_id=None if keyframe else latest.keyframe_id,
+                base_run_id=None if keyframe else latest.id,
+                flight_count=len(by_flight),
+                changed_count=len(changed),
+                top_k=self.top_k,
+                weights=json.dumps(weights),
+                components=json.dumps(components),
+                payload=_encode({'flights': changed, 'unchanged': unchanged})
+            )
+            db.session.add(run)
+            db.session.flush()
+            if keyframe:
+                run.keyframe_id = run.id
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if run.id % PRUNE_EVERY == 0:
+            self.prune()
+        return run.id
+
+    def _chain(self, run):
+        """Rows from ``run``'s keyframe to ``run`` following base run ids, oldest first"""
+        rows = {link.id: link for link in RecommendationRun.query.filter(
+            RecommendationRun.keyframe_id == run.keyframe_id, RecommendationRun.id <= run.id
+        )}
+        chain = []
+        link = rows.get(run.id)
+        while link is not None:
+            chain.append(link)
+            if link.is_keyframe:
+                break
+            base_id = link.base_run_id
+            if base_id is None:
+                # Recorded before base ids were stored: its base is the previous run
+                base_id = max((i for i in rows if i < link.id), default=None)
+            link = rows.get(base_id)
+        return chain[::-1]
+
+    def _chain_state(self, run):
+        state = {}
+        for link in self._chain(run):
+            state.update({int(fid): rows for fid, rows in _decode(link.payload).get('flights', {}).items()})
+        return state
+
+    def snapshot(self, run_id):
+        """Full snapshot of one run: {run, flights: {flight_id: top-K rows}}, or None"""
+        run = db.session.get(RecommendationRun, run_id)
+        if run is None:
+            return None
+        state = {}
+        payload = {}
+        for link in self._chain(run):
+            payload = _decode(link.payload)
+            state.update({int(fid): rows for fid, rows in payload.get('flights', {}).items()})
+        scored = {int(fid) for fid in payload.get('flights', {})} | set(payload.get('unchanged', []))
+        return {'run': run.to_dict(), 'flights': {fid: state[fid] for fid in sorted(scored) if fid in state}}
+
+    def diff(self, from_id, to_id):
+        """Explain what changed per flight between two runs"""
+        before, after = self.snapshot(from_id), self.snapshot(to_id)
+        if before is None or after is None:
+            raise ValueError('Unknown recommendation run')
+
+        def best(snapshot, rows):
+            columns = ['gate_number', 'total_score'] + snapshot['run']['components']
+            return dict(zip(columns, rows[0])) if rows else {}
+
+        old_flights, new_flights = before['flights'], after['flights']
+        changes = []
+        for flight_id in sorted(set(old_flights) & set(new_flights)):
+            if old_flights[flight_id] == new_flights[flight_id]:
+                continue
+            old, new = best(before, old_flights[flight_id]), best(after, new_flights[flight_id])
+            changes.append({
+                'flight_id': flight_id,
+                'from_gate': old.get('gate_number'),
+                'to_gate': new.get('gate_number'),
+                'gate_changed': old.get('gate_number') != new.get('gate_number'),
+                # Best-gate score movement per component, which is the "why"
+                'score_deltas': {
+                    name: round(new[name] - old[name], 2)
+                    for name in new if name != 'gate_number' and name in old
+                }
+            })
+
+        old_weights, new_weights = before['run']['weights'], after['run']['weights']
+        return {
+            'from_run': before['run'],
+            'to_run': after['run'],
+            'weight_changes': {
+                name: {'from': old_weights.get(name), 'to': new_weights.get(name)}
+                for name in sorted(set(old_weights) | set(new_weights))
+                if old_weights.get(name) != new_weights.get(name)
+            },
+            'changed': changes,
+            'added': sorted(set(new_flights) - set(old_flights)),
+            'removed': sorted(set(old_flights) - set(new_flights))
+        }
+
+    def prune(self, now=None):
+        """Delete chains whose newest run is older than the retention window"""
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        oldest_kept = RecommendationRun.query.filter(
+            RecommendationRun.created_at >= cutoff
+        ).order_by(RecommendationRun.id.asc()).first()
+        if oldest_kept is None:
+            boundary = (db.session.query(db.func.max(RecommendationRun.id)).scalar() or 0) + 1
+        else:
+            boundary = oldest_kept.keyframe_id
+        deleted = RecommendationRun.query.filter(
+            RecommendationRun.id < boundary
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
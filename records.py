@@ -0,0 +1,74 @@
+"""Read-only flight and gate records for engine-internal work.
+
+The engine only reads a dozen columns per flight, so instead of ORM
+instances (identity map, instrumented attributes, lazy loads) it works on
+namedtuples loaded with column-only queries. The field names match the
+model attributes, so the scoring, capacity and rules code takes either.
+Writes go back through bulk statements keyed on ``id``.
+"""
+
+from collections import namedtuple
+from models import Flight, Gate
+from extensions import db
+
+FLIGHT_RECORD_FIELDS = (
+    'id', 'flight_number', 'scheduled_date', 'scheduled_time', 'aircraft_type',
+    'assigned_gate', 'planned_gate', 'aibt', 'eibt', 'eldt', 'aobt', 'tobt',
+    'flight_type', 'status'
+)
+
+GATE_RECORD_FIELDS = (
+    'id', 'gate_number', 'gate_type', 'max_aircraft', 'aircraft_types', 'terminal',
+    'concourse', 'coordinates_x', 'coordinates_y', 'is_active', 'maintenance_status'
+)
+
+# Low-cardinality columns whose equal values share one object across records
+SHARED_FLIGHT_FIELDS = (
+    'scheduled_date', 'scheduled_time', 'aircraft_type', 'assigned_gate', 'planned_gate',
+    'flight_type', 'status'
+)
+
+FlightRecord = namedtuple('FlightRecord', FLIGHT_RECORD_FIELDS, defaults=(None,) * len(FLIGHT_RECORD_FIELDS))
+GateRecord = namedtuple('GateRecord', GATE_RECORD_FIELDS, defaults=(None,) * len(GATE_RECORD_FIELDS))
+
+
+def flight_record(values):
+    """FlightRecord from a dict of column values; unknown keys are ignored"""
+    return FlightRecord(**{k: values[k] for k in FLIGHT_RECORD_FIELDS if k in values})
+
+
+def gate_record(values):
+    """GateRecord from a dict of column values; unknown keys are ignored"""
+    return GateRecord(**{k: values[k] for k in GATE_RECORD_FIELDS if k in values})
+
+
+def load_flights(*criteria):
+    """FlightRecords matching the given filter criteria"""
+    query = db.session.query(*[getattr(Flight, f) for f in FLIGHT_RECORD_FIELDS])
+    if criteria:
+        query = query.filter(*criteria)
+    shared = [FLIGHT_RECORD_FIELDS.index(f) for f in SHARED_FLIGHT_FIELDS]
+    canonical = {}
+    records = []
+    for row in query:
+        values = list(row)
+        for i in shared:
+            values[i] = canonical.setdefault(values[i], values[i])
+        records.append(FlightRecord._make(values))
+    return records
+
+
+def load_gates():
+    """Every gate as a GateRecord, in id order"""
+    query = db.session.query(*[getattr(Gate, f) for f in GATE_RECORD_FIELDS]).order_by(Gate.id.asc())
+    return [GateRecord._make(row) for row in query]
+
+
+def save_assigned_gates(gates_by_flight):
+    """Set assigned_gate for {flight_id: gate_number} in one bulk UPDATE and commit"""
+    if gates_by_flight:
+        db.session.execute(
+            db.update(Flight),
+            [{'id': fid, 'assigned_gate': gate} for fid, gate in gates_by_flight.items()]
+        )
+    db.session.commit()
@@ -88,6 +88,7 @@ def add_sample_flights():
     print(f"Added {len(sample_flights)} sample flights")
 
 if __name__ == '__main__':
-    from app import app
+    from db_bootstrap import create_db_app
+    app = create_db_app()
     with app.app_context():
         add_sample_flights()
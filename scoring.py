@@ -0,0 +1,264 @@
+"""Scoring components evaluated over the whole flights x gates matrix.
+
+A component is a function ``fn(ctx) -> ndarray`` of shape
+``(len(ctx.flights), len(ctx.gates))``. It works on the context's feature
+arrays, not on individual ORM objects. Components are declared on a
+``ScoringRegistry``::
+
+    @registry.component('apron_congestion', weight=0.1)
+    def apron_congestion(ctx):
+        return 100 - ctx.gate_features['stands_nearby'][None, :] * 5
+
+Score components (0-100) are combined by weight. Penalty components
+(score points) are subtracted. Each component is timed per evaluation, and
+``cacheable`` ones are reused while the context fingerprint is unchanged.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from gate_timeline import flight_interval
+
+CACHE_SIZE = 32
+
+
+def _in_block_hour(flight):
+    # Turnaround samples are bucketed by in-block hour; for a departure the
+    # scheduled time is off-block, so use the start of its gate interval
+    interval = flight_interval(flight)
+    return interval[0].hour if interval else -1
+
+
+class ScoringContext:
+    """Flights, gates and their feature arrays for one evaluation.
+
+    ``services`` carries precomputed models components may consult (terminal
+    layout, turnaround model, connection matrix, ...).
+    """
+
+    def __init__(self, flights, gates, services=None):
+        self.flights = flights
+        self.gates = gates
+        self.services = services or {}
+
+        self.flight_features = {
+            'id': np.array([f.id for f in flights]),
+            'aircraft_type': np.array([f.aircraft_type or '' for f in flights], dtype=object),
+            'in_block_hour': np.array([_in_block_hour(f) for f in flights]),
+        }
+        self.gate_features = {
+            'gate_number': np.array([g.gate_number for g in gates], dtype=object),
+            'gate_type': np.array([g.gate_type or '' for g in gates], dtype=object),
+            'aircraft_types': [frozenset((g.aircraft_types or '').split(',')) - {''} for g in gates],
+        }
+        self._features_digest = None
+
+    @property
+    def shape(self):
+        return len(self.flights), len(self.gates)
+
+    def take(self, rows, cols):
+        """Sub-context restricted to the given flight rows and gate columns"""
+        return ScoringContext([self.flights[i] for i in rows], [self.gates[j] for j in cols], self.services)
+
+    def fingerprint(self, uses=()):
+        """Cache key: the feature arrays plus the versions of the services used.
+
+        None when a service in use has no version (built in memory, not from
+        the stored config), as its content cannot be told apart then.
+        """
+        if self._features_digest is None:
+            digest = hashlib.sha1()
+            for features in (self.flight_features, self.gate_features):
+                for name in sorted(features):
+                    digest.update(name.encode())
+                    digest.update(repr([
+                        sorted(v) if isinstance(v, frozenset) else v for v in features[name]
+                    ]).encode())
+            self._features_digest = digest.hexdigest()
+        services = []
+        for name in uses:
+            service = self.services.get(name)
+            version = getattr(service, 'version', None)
+            if service is not None and version is None:
+                return None
+            services.append((name, version))
+        return self._features_digest, tuple(services)
+
+
+class ScoringComponent:
+    """``uses`` names the context services the component reads; their
+    ``version`` attributes are part of its cache key. A component is not
+    cached while one of them has no version."""
+
+    def __init__(self, name, fn, weight=0.0, penalty=False, cacheable=False, uses=()):
+        self.name = name
+        self.fn = fn
+        self.weight = weight
+        self.penalty = penalty
+        self.cacheable = cacheable
+        self.uses = tuple(uses)
+
+
+class ScoringRegistry:
+    def __init__(self):
+        self.components = OrderedDict()
+        self._cache = OrderedDict()
+        # Requests on different threads share the registry and its cache
+        self._cache_lock = threading.Lock()
+
+    def component(self, name, weight=0.0, penalty=False, cacheable=False, uses=()):
+        """Decorator registering ``fn(ctx) -> (flights x gates) array``"""
+        def decorator(fn):
+            self.register(ScoringComponent(name, fn, weight, penalty, cacheable, uses))
+            return fn
+        return decorator
+
+    def register(self, component):
+        self.components[component.name] = component
+        with self._cache_lock:
+            self._cache.clear()
+
+    def unregister(self, name):
+        self.components.pop(name, None)
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _evaluate_component(self, component, ctx):
+        fingerprint = ctx.fingerprint(component.uses) if component.cacheable else None
+        key = (component.name, fingerprint) if fingerprint is not None else None
+        if key is not None:
+            with self._cache_lock:
+                values = self._cache.get(key)
+                if values is not None:
+                    self._cache.move_to_end(key)
+                    return values
+
+        values = np.broadcast_to(np.asarray(component.fn(ctx), dtype=float), ctx.shape)
+        if key is not None:
+            with self._cache_lock:
+                self._cache[key] = values
+                if len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return values
+
+    def evaluate(self, ctx, weights=None):
+        """Evaluate every component; returns ({name: matrix}, total matrix, {name: ms}).
+
+        ``weights`` overrides the registered weight per component name. The
+        last item holds this call's per-component wall times.
+        """
+        weights = weights or {}
+        matrices = {}
+        total = np.zeros(ctx.shape)
+        timings = {}
+        for name, component in self.components.items():
+            start = time.perf_counter()
+            values = self._evaluate_component(component, ctx)
+            timings[name] = (time.perf_counter() - start) * 1000
+            matrices[name] = values
+            weight = weights.get(name, component.weight)
+            total = total - weight * values if component.penalty else total + weight * values
+        return matrices, total, timings
+
+
+# Built-in components ---------------------------------------------------------
+
+GATE_TYPE_FACTORS = {'gate': 1.0, 'ramp': 0.9, 'hangar': 0.8}
+UNKNOWN_GATE_TYPE_FACTOR = 0.7
+
+DEFAULT_TURNAROUND_MINUTES = {'gate': 30, 'ramp': 35, 'hangar': 45}
+UNKNOWN_TURNAROUND_MINUTES = 40
+MIN_TURNAROUND_MINUTES = 25
+MAX_TURNAROUND_MINUTES = 60
+
+MAX_WALKING_METRES = 1000
+UNKNOWN_DISTANCE_SCORE = 50
+
+
+def compatibility_matrix(ctx):
+    """True where the gate accepts the flight's aircraft type"""
+    types = ctx.flight_features['aircraft_type']
+    matrix = np.zeros(ctx.shape, dtype=bool)
+    for j, accepted in enumerate(ctx.gate_features['aircraft_types']):
+        if accepted:
+            matrix[:, j] = np.isin(types, list(accepted))
+    return matrix
+
+
+def compatibility(ctx):
+    # Aircraft type must be accepted; gates beat ramps beat hangars
+    factors = np.array([
+        GATE_TYPE_FACTORS.get(t, UNKNOWN_GATE_TYPE_FACTOR) for t in ctx.gate_features['gate_type']
+    ])
+    return compatibility_matrix(ctx) * (100 * factors)[None, :]
+
+
+def turnaround(ctx):
+    # Historical mean turnaround per (gate, aircraft type, hour): one
+    # [type, hour, gate] table from the model, gathered for every flight at once
+    model = ctx.services.get('turnaround_model')
+    defaults = np.array([
+        DEFAULT_TURNAROUND_MINUTES.get(t, UNKNOWN_TURNAROUND_MINUTES) for t in ctx.gate_features['gate_type']
+    ], dtype=float)
+
+    minutes = np.broadcast_to(defaults, ctx.shape)
+    if model is not None and len(ctx.flights):
+        aircraft_types, type_codes = np.unique(
+            ctx.flight_features['aircraft_type'].astype(str), return_inverse=True
+        )
+        hours = ctx.flight_features['in_block_hour']
+        hour_codes = np.where((hours >= 0) & (hours < 24), hours, 24)
+        known = model.table(ctx.gate_features['gate_number'], aircraft_types)[type_codes, hour_codes]
+        minutes = np.where(np.isnan(known), defaults[None, :], known)
+
+    score = 100 * (MAX_TURNAROUND_MINUTES - minutes) / (MAX_TURNAROUND_MINUTES - MIN_TURNAROUND_MINUTES)
+    return np.clip(score, 0, 100)
+
+
+def distance(ctx):
+    # Walking distance from the nearest checkpoint through the terminal graph
+    layout = ctx.services.get('layout')
+    scores = np.full(len(ctx.gates), float(UNKNOWN_DISTANCE_SCORE))
+    if layout is not None:
+        for j, gate_number in enumerate(ctx.gate_features['gate_number']):
+            metres = layout.walking_distance(gate_number)
+            if metres is not None:
+                scores[j] = np.clip(100 * (1 - metres / MAX_WALKING_METRES), 0, 100)
+    return scores[None, :]
+
+
+def connection_penalty(ctx):
+    # Passengers at risk of missing their connection, plus passenger-km walked
+    connections = ctx.services.get('connections')
+    weights = ctx.services.get('connection_weights', {})
+    if connections is None:
+        return np.zeros(ctx.shape)
+    missed, transfer_metres = connections.gather(ctx.flight_features['id'], ctx.gate_features['gate_number'])
+    return (
+        missed * weights.get('missed_passenger', 1.0) +
+        transfer_metres / 1000 * weights.get('transfer_km', 0.5)
+    )
+
+
+def airline_preference(ctx):
+    # Points lost when an airline parks outside its preferred concourses
+    rules = ctx.services.get('rules')
+    if rules is None:
+        return np.zeros(ctx.shape)
+    return rules.penalties(ctx.flights, ctx.gates)
+
+
+def default_registry():
+    """Registry with the built-in components and their default weights"""
+    registry = ScoringRegistry()
+    registry.register(ScoringComponent('compatibility', compatibility, weight=0.5, cacheable=True))
+    registry.register(ScoringComponent(
+        'turnaround', turnaround, weight=0.3, cacheable=True, uses=('turnaround_model',)
+    ))
+    registry.register(ScoringComponent('distance', distance, weight=0.2, cacheable=True, uses=('layout',)))
+    registry.register(ScoringComponent('connection_penalty', connection_penalty, weight=1.0, penalty=True))
+    registry.register(ScoringComponent('airline_preference', airline_preference, weight=1.0, penalty=True))
+    return registry
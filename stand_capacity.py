@@ -0,0 +1,278 @@
+import json
+from bisect import bisect_left, bisect_right, insort
+import numpy as np
+from models import AirportConfig
+from gate_timeline import flight_interval, to_epoch
+
+BUFFER_CONFIG_KEY = 'gate_buffer_minutes'
+
+# Minutes a stand is blocked before in-block and after off-block, per gate type
+DEFAULT_BUFFER_MINUTES = {
+    'gate': {'pre': 10, 'post': 10},
+    'ramp': {'pre': 15, 'post': 15},
+    'hangar': {'pre': 30, 'post': 30},
+}
+
+
+def buffered_window(flight, gate, buffers, interval=None):
+    """Buffered [start, end) epoch seconds the flight would block ``gate``.
+
+    ``interval`` is the flight's unbuffered (start, end) in epoch seconds,
+    when the caller already has it.
+    """
+    if interval is None:
+        interval = flight_interval(flight)
+        if interval is None:
+            return None
+        interval = (to_epoch(interval[0]), to_epoch(interval[1]))
+    buffer = buffers.get(gate.gate_type if gate else None, {})
+    return (
+        interval[0] - int(buffer.get('pre', 0) * 60),
+        interval[1] + int(buffer.get('post', 0) * 60)
+    )
+
+
+def load_buffer_minutes():
+    """Per gate type pre/post buffers, with AirportConfig overriding the defaults"""
+    buffers = {k: dict(v) for k, v in DEFAULT_BUFFER_MINUTES.items()}
+    config = AirportConfig.query.filter_by(config_key=BUFFER_CONFIG_KEY).first()
+    if config and config.config_value:
+        for gate_type, values in json.loads(config.config_value).items():
+            buffers.setdefault(gate_type, {'pre': 0, 'post': 0}).update(values)
+    return buffers
+
+
+class _StandProfile:
+    """Occupancy step function for one stand with an O(1) range-max table"""
+
+    def __init__(self, intervals):
+        self.intervals = sorted(intervals)
+        events = []
+        for start, end in self.intervals:
+            events.append((start, 1))
+            events.append((end, -1))
+        # At equal times departures come first, so back-to-back use is not an overlap
+        events.sort(key=lambda e: (e[0], e[1]))
+
+        self.times = []
+        occupancy = []
+        level = 0
+        for t, delta in events:
+            level += delta
+            if self.times and self.times[-1] == t:
+                occupancy[-1] = level
+            else:
+                self.times.append(t)
+                occupancy.append(level)
+
+        # Sparse table: levels[j][i] = max(occupancy[i : i + 2**j])
+        self.levels = [np.asarray(occupancy, dtype=np.int32)]
+        width = 1
+        while width * 2 <= len(occupancy):
+            prev = self.levels[-1]
+            self.levels.append(np.maximum(prev[:-width], prev[width:]))
+            width *= 2
+
+    @property
+    def peak(self):
+        return int(self.levels[0].max()) if len(self.levels[0]) else 0
+
+    def max_occupancy(self, start, end):
+        """Highest number of aircraft on the stand at any time in [start, end)"""
+        if not self.times or end <= start:
+            return 0
+        # Segment i covers [times[i], times[i + 1])
+        lo = max(bisect_right(self.times, start) - 1, 0)
+        hi = bisect_left(self.times, end) - 1
+        if hi < lo:
+            return 0
+        j = (hi - lo + 1).bit_length() - 1
+        return int(max(self.levels[j][lo], self.levels[j][hi - (1 << j) + 1]))
+
+    def max_occupancy_many(self, starts, ends):
+        """``max_occupancy`` for arrays of windows at once"""
+        result = np.zeros(len(starts), dtype=np.int32)
+        if not self.times:
+            return result
+        times = np.asarray(self.times)
+        lo = np.maximum(np.searchsorted(times, starts, side='right') - 1, 0)
+        hi = np.searchsorted(times, ends, side='left') - 1
+        valid = (hi >= lo) & (ends > starts)
+        width = np.where(valid, hi - lo + 1, 1)
+        level = np.floor(np.log2(width)).astype(int)
+        for j in np.unique(level[valid]):
+            rows = np.flatnonzero(valid & (level == j))
+            table = self.levels[j]
+            result[rows] = np.maximum(table[lo[rows]], table[hi[rows] - (1 << j) + 1])
+        return result
+
+
+class StandCapacity:
+    """Sweep-line occupancy per stand for one planning run.
+
+    Built once from the occupying flights (with per gate type buffers), it
+    answers "can this flight fit on this stand" with two bisects and a
+    sparse-table lookup, or for a whole flights x gates matrix at once. This
+    works for single-aircraft gates and for hangars/ramps with
+    ``max_aircraft > 1``.
+    """
+
+    def __init__(self, gates, occupants, buffers=None):
+        self.buffers = buffers or DEFAULT_BUFFER_MINUTES
+        self.gates = {g.gate_number: g for g in gates}
+        self.assigned = {}
+        by_gate = {}
+        for flight in occupants:
+            gate = self.gates.get(flight.assigned_gate)
+            window = self.window(flight, gate)
+            if window is None:
+                continue
+            by_gate.setdefault(flight.assigned_gate, []).append(window)
+            self.assigned[flight.id] = flight.assigned_gate
+        self.profiles = {g: _StandProfile(intervals) for g, intervals in by_gate.items()}
+
+    def window(self, flight, gate):
+        return buffered_window(flight, gate, self.buffers)
+
+    def peak(self, gate_number):
+        profile = self.profiles.get(gate_number)
+        return profile.peak if profile else 0
+
+    def fits(self, gate, flight):
+        """True if the stand has room for ``flight`` over its buffered window"""
+        window = self.window(flight, gate)
+        if window is None:
+            return True
+        profile = self.profiles.get(gate.gate_number)
+        occupied = profile.max_occupancy(*window) if profile else 0
+        if self.assigned.get(flight.id) == gate.gate_number:
+            # The flight's own interval is part of the profile
+            occupied -= 1
+        return occupied < (gate.max_aircraft or 1)
+
+    def fits_matrix(self, flights, gates):
+        """``fits`` for every flight x gate pair, as a boolean matrix"""
+        result = np.ones((len(flights), len(gates)), dtype=bool)
+        intervals = [flight_interval(f) for f in flights]
+        timed = np.array([i is not None for i in intervals])
+        if not timed.any():
+            return result
+        starts = np.array([to_epoch(i[0]) if i else 0 for i in intervals], dtype=np.int64)
+        ends = np.array([to_epoch(i[1]) if i else 0 for i in intervals], dtype=np.int64)
+        assigned = np.array([self.assigned.get(f.id) for f in flights], dtype=object)
+
+        for j, gate in enumerate(gates):
+            profile = self.profiles.get(gate.gate_number)
+            if profile is None:
+                continue
+            buffer = self.buffers.get(gate.gate_type, {})
+            occupied = profile.max_occupancy_many(
+                starts - int(buffer.get('pre', 0) * 60), ends + int(buffer.get('post', 0) * 60)
+            )
+            occupied = occupied - (assigned == gate.gate_number)
+            result[:, j] = ~timed | (occupied < (gate.max_aircraft or 1))
+        return result
+
+
+class StandOccupancy:
+    """Mutable stand occupancy for assignment: capacity plus adjacency.
+
+    Each stand keeps its placed windows sorted by start. A placement is
+    checked against the stand's own capacity and against the precomputed
+    conflict set for (stand, ICAO code) from ``GateRules``, so only the few
+    neighbours that can interfere are looked at. Windows are added and
+    removed as the solver places or moves flights.
+    """
+
+    def __init__(self, gates, rules, occupants=(), buffers=None):
+        self.buffers = buffers or DEFAULT_BUFFER_MINUTES
+        self.rules = rules
+        self.gates = {g.gate_number: g for g in gates}
+        self._entries = {}  # gate_number -> sorted [(start, end, flight_id, rank)]
+        self._longest = {}
+        self._placed = {}  # flight_id -> (gate_number, entry)
+        self._flights = {}  # flight_id -> (epoch interval or None, ICAO rank)
+        for flight in occupants:
+            gate = self.gates.get(flight.assigned_gate)
+            if gate is not None:
+                self.add(flight, gate)
+
+    def _describe(self, flight):
+        described = self._flights.get(flight.id)
+        if described is None:
+            interval = flight_interval(flight)
+            if interval is not None:
+                interval = (to_epoch(interval[0]), to_epoch(interval[1]))
+            rank = 0
+            if self.rules is not None:
+                rank = self.rules.category(flight)[1] or 0
+            described = self._flights[flight.id] = (interval, rank)
+        return described
+
+    def _window(self, flight, gate):
+        interval = self._describe(flight)[0]
+        return buffered_window(flight, gate, self.buffers, interval) if interval else None
+
+    def _overlapping(self, gate_number, start, end, exclude=None):
+        entries = self._entries.get(gate_number)
+        if not entries:
+            return []
+        lo = bisect_left(entries, (start - self._longest[gate_number],))
+        hi = bisect_left(entries, (end,))
+        return [e for e in entries[lo:hi] if e[1] > start and e[2] != exclude]
+
+    def gate_of(self, flight_id):
+        placed = self._placed.get(flight_id)
+        return placed[0] if placed else None
+
+    def has_room(self, flight, gate):
+        window = self._window(flight, gate)
+        if window is None:
+            return True
+        overlapping = self._overlapping(gate.gate_number, *window, exclude=flight.id)
+        capacity = gate.max_aircraft or 1
+        if len(overlapping) < capacity:
+            return True
+        if capacity == 1:
+            return False
+        return _StandProfile(
+            [(max(e[0], window[0]), min(e[1], window[1])) for e in overlapping]
+        ).peak < capacity
+
+    def adjacency_ok(self, flight, gate):
+        if self.rules is None or not self.rules.has_conflicts(gate.gate_number):
+            return True
+        window = self._window(flight, gate)
+        if window is None:
+            return True
+        for neighbour, ranks in self.rules.conflicts(gate.gate_number, self._describe(flight)[1]).items():
+            for entry in self._overlapping(neighbour, *window, exclude=flight.id):
+                if entry[3] in ranks:
+                    return False
+        return True
+
+    def fits(self, flight, gate):
+        return self.has_room(flight, gate) and self.adjacency_ok(flight, gate)
+
+    def blocking(self, flight, gate):
+        """Ids of the flights overlapping ``flight``'s window on ``gate`` itself"""
+        window = self._window(flight, gate)
+        if window is None:
+            return []
+        return [e[2] for e in self._overlapping(gate.gate_number, *window, exclude=flight.id)]
+
+    def add(self, flight, gate):
+        self.remove(flight.id)
+        window = self._window(flight, gate)
+        if window is None:
+            return
+        entry = (window[0], window[1], flight.id, self._describe(flight)[1])
+        insort(self._entries.setdefault(gate.gate_number, []), entry)
+        self._longest[gate.gate_number] = max(self._longest.get(gate.gate_number, 0), window[1] - window[0])
+        self._placed[flight.id] = (gate.gate_number, entry)
+
+    def remove(self, flight_id):
+        placed = self._placed.pop(flight_id, None)
+        if placed:
+            entries = self._entries[placed[0]]
+            del entries[bisect_left(entries, placed[1])]
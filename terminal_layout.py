@@ -0,0 +1,169 @@
+import json
+import math
+import threading
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from models import AirportConfig
+from records import load_gates
+from gate_config import config_version
+
+LAYOUT_CONFIG_KEY = 'terminal_layout'
+
+
+def _euclidean(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+class TerminalLayout:
+    """Walking-distance tables precomputed from a terminal graph.
+
+    The graph has security checkpoints, concourse/terminal nodes and gates.
+    It comes from the ``terminal_layout`` AirportConfig entry (JSON)::
+
+        {"nodes": [{"id": "SEC1", "type": "checkpoint", "x": 0, "y": 0},
+                   {"id": "A", "type": "concourse", "x": 150, "y": 50}],
+         "edges": [["SEC1", "A"], ["A", "B", 120]],
+         "gate_links": {"A1": "A"}}
+
+    Edge lengths default to the straight-line distance between node
+    coordinates. Gates link to the node named in ``gate_links``, otherwise to
+    their concourse, otherwise to their terminal. Without a configured layout,
+    a single checkpoint at (0, 0) connects to one node per concourse (or
+    terminal), placed at the centroid of its gates.
+
+    Distances from the nearest checkpoint to every gate, and between every pair
+    of gates (for transfers), are computed once with Dijkstra and then served
+    as array lookups.
+    """
+
+    def __init__(self, gates, layout=None, version=None):
+        self.version = version
+        self.gate_index = {}
+        self.checkpoint_distances = np.zeros(0)
+        self.gate_distances = np.zeros((0, 0))
+        self._build(gates, layout or {})
+
+    def _build(self, gates, layout):
+        positions = {}
+        node_ids = []
+        checkpoints = []
+
+        def add_node(node_id, x=None, y=None):
+            if node_id not in positions:
+                positions[node_id] = (x, y) if x is not None and y is not None else None
+                node_ids.append(node_id)
+
+        for node in layout.get('nodes', []):
+            add_node(node['id'], node.get('x'), node.get('y'))
+            if node.get('type') == 'checkpoint':
+                checkpoints.append(node['id'])
+
+        gate_links = dict(layout.get('gate_links', {}))
+        edges = [tuple(e) for e in layout.get('edges', [])]
+
+        if not layout.get('nodes'):
+            # Implicit layout: checkpoint at the origin, one hub per concourse/terminal
+            add_node('__checkpoint__', 0.0, 0.0)
+            checkpoints.append('__checkpoint__')
+            groups = {}
+            for gate in gates:
+                group = gate.concourse or gate.terminal
+                if group and gate.coordinates_x is not None and gate.coordinates_y is not None:
+                    groups.setdefault(group, []).append((gate.coordinates_x, gate.coordinates_y))
+            for group, points in groups.items():
+                hub = f'__hub__{group}'
+                add_node(hub, sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+                edges.append(('__checkpoint__', hub))
+
+        for gate in gates:
+            has_coordinates = gate.coordinates_x is not None and gate.coordinates_y is not None
+            gate_node = f'gate:{gate.gate_number}'
+            add_node(gate_node, gate.coordinates_x, gate.coordinates_y)
+            self.gate_index[gate.gate_number] = len(self.gate_index)
+
+            link = gate_links.get(gate.gate_number)
+            if link is None:
+                for group in (gate.concourse, gate.terminal):
+                    if not group:
+                        continue
+                    if group in positions:
+                        link = group
+                        break
+                    if f'__hub__{group}' in positions:
+                        link = f'__hub__{group}'
+                        break
+            if link is None and not layout.get('nodes'):
+                link = '__checkpoint__'
+            if link is not None and has_coordinates:
+                edges.append((gate_node, link))
+
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
+        rows, cols, weights = [], [], []
+        for edge in edges:
+            a, b = edge[0], edge[1]
+            if a not in index or b not in index:
+                continue
+            if len(edge) > 2:
+                length = float(edge[2])
+            elif positions[a] is not None and positions[b] is not None:
+                length = _euclidean(positions[a], positions[b])
+            else:
+                continue
+            # csgraph treats explicit zeros as missing edges
+            length = max(length, 1e-6)
+            rows += [index[a], index[b]]
+            cols += [index[b], index[a]]
+            weights += [length, length]
+
+        graph = csr_matrix((weights, (rows, cols)), shape=(len(node_ids), len(node_ids)))
+        gate_nodes = [index[f'gate:{g}'] for g in self.gate_index]
+
+        if checkpoints and gate_nodes:
+            from_checkpoints = dijkstra(graph, directed=False, indices=[index[c] for c in checkpoints], min_only=True)
+            self.checkpoint_distances = from_checkpoints[gate_nodes]
+        else:
+            self.checkpoint_distances = np.full(len(gate_nodes), np.inf)
+
+        if gate_nodes:
+            self.gate_distances = dijkstra(graph, directed=False, indices=gate_nodes)[:, gate_nodes]
+        else:
+            self.gate_distances = np.zeros((0, 0))
+
+    def walking_distance(self, gate_number):
+        """Metres from the nearest checkpoint, or None when the gate is not reachable"""
+        idx = self.gate_index.get(gate_number)
+        if idx is None or not np.isfinite(self.checkpoint_distances[idx]):
+            return None
+        return float(self.checkpoint_distances[idx])
+
+    def transfer_distance(self, from_gate, to_gate):
+        """Metres between two gates through the terminal graph, or None"""
+        i, j = self.gate_index.get(from_gate), self.gate_index.get(to_gate)
+        if i is None or j is None or not np.isfinite(self.gate_distances[i, j]):
+            return None
+        return float(self.gate_distances[i, j])
+
+
+class TerminalLayoutCache:
+    """Holds the current TerminalLayout, rebuilding it when gate config changes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._layout = None
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+
+    def current(self):
+        version = config_version(LAYOUT_CONFIG_KEY)
+        with self._lock:
+            if self._layout is None or version != self._version:
+                config = AirportConfig.query.filter_by(config_key=LAYOUT_CONFIG_KEY).first()
+                layout = json.loads(config.config_value) if config and config.config_value else None
+                gates = sorted(load_gates(), key=lambda g: g.gate_number)
+                self._layout = TerminalLayout(gates, layout, version)
+                self._version = version
+            return self._layout
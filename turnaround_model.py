@@ -0,0 +1,230 @@
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from models import Flight, TurnaroundStat, TurnaroundSample, AirportConfig
+from extensions import db
+from sqlalchemy.exc import IntegrityError
+
+# Off-block watermark used before per-flight samples; migrated away on first refresh
+LEGACY_WATERMARK_KEY = 'turnaround_stats_watermark'
+
+# Buckets with fewer completed turnarounds fall back to a coarser level
+MIN_SAMPLES = 3
+
+# Ignore obviously bad actuals (negative, or parked for more than a day)
+MAX_TURNAROUND_MINUTES = 24 * 60
+
+REFRESH_INTERVAL_SECONDS = 300
+
+
+def _contribution(gate_number, aircraft_type, aibt, aobt):
+    """(gate, type, hour) bucket and minutes one flight adds, or None if unusable"""
+    if aibt is None or aobt is None or not gate_number:
+        return None
+    minutes = (aobt - aibt).total_seconds() / 60
+    if minutes <= 0 or minutes > MAX_TURNAROUND_MINUTES:
+        return None
+    return (gate_number, aircraft_type or '', aibt.hour), minutes
+
+
+class TurnaroundModel:
+    """Historical turnaround times per gate x aircraft type x hour of day.
+
+    Completed flights (``aibt`` and ``aobt`` both known) are folded into the
+    ``turnaround_stats`` table incrementally. Each folded flight keeps a
+    ``turnaround_samples`` row with what it contributed and the
+    ``updated_at`` it was folded at. A flight edited after that (late or
+    corrected actuals) has its old contribution replaced, not added twice.
+    Lookups go through in-memory dicts, falling back from (gate, type, hour)
+    to (gate, type) to (gate) when a bucket is too thin.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._last_refresh = 0
+        # Bumped on every reload so cached scores built from old stats expire
+        self.version = 0
+        self.by_hour = {}
+        self.by_type = {}
+        self.by_gate = {}
+
+    def _migrate_watermark(self):
+        """Record flights the old off-block watermark already counted as samples.
+
+        Their stats stay as they are; the watermark row is then removed.
+        """
+        config = AirportConfig.query.filter_by(config_key=LEGACY_WATERMARK_KEY).first()
+        if config is None:
+            return
+        if config.config_value:
+            rows = db.session.query(
+                Flight.id, Flight.flight_number, Flight.scheduled_date, Flight.assigned_gate,
+                Flight.aircraft_type, Flight.aibt, Flight.aobt, Flight.updated_at
+            ).filter(
+                Flight.aibt.isnot(None),
+                Flight.aobt <= datetime.fromisoformat(config.config_value),
+                ~Flight.id.in_(db.session.query(TurnaroundSample.flight_id))
+            )
+            for row in rows:
+                db.session.add(self._sample(row, _contribution(*row[3:7])))
+        db.session.delete(config)
+        db.session.commit()
+
+    @staticmethod
+    def _sample(flight, contribution):
+        key, minutes = contribution or ((None, None, None), None)
+        return TurnaroundSample(
+            flight_id=flight.id, flight_number=flight.flight_number, scheduled_date=flight.scheduled_date,
+            gate_number=key[0], aircraft_type=key[1], hour_of_day=key[2], minutes=minutes,
+            folded_at=flight.updated_at or datetime.utcnow()
+        )
+
+    def refresh(self):
+        """Fold new and changed completed turnarounds into the stats table, then reload"""
+        try:
+            self._migrate_watermark()
+        except IntegrityError:
+            # Another worker migrated at the same time
+            db.session.rollback()
+
+        # Flights never folded (completed ones only), and folded flights
+        # edited since; the latter may have lost their actuals
+        rows = db.session.query(
+            Flight.id, Flight.flight_number, Flight.scheduled_date, Flight.assigned_gate,
+            Flight.aircraft_type, Flight.aibt, Flight.aobt, Flight.updated_at, TurnaroundSample
+        ).outerjoin(
+            TurnaroundSample, TurnaroundSample.flight_id == Flight.id
+        ).filter(
+            ((TurnaroundSample.flight_id.is_(None) & Flight.aibt.isnot(None) & Flight.aobt.isnot(None)) |
+             (Flight.updated_at > TurnaroundSample.folded_at))
+        ).all()
+        if not rows:
+            return self.load()
+
+        buckets = defaultdict(lambda: [0, 0.0])
+        try:
+            for row in rows:
+                sample = row.TurnaroundSample
+                contribution = _contribution(*row[3:7])
+                if sample is None:
+                    db.session.add(self._sample(row, contribution))
+                else:
+                    # Claim the refold only if no other worker refolded it first
+                    claimed = TurnaroundSample.query.filter_by(
+                        flight_id=sample.flight_id, folded_at=sample.folded_at
+                    ).update({'folded_at': row.updated_at}, synchronize_session=False)
+                    if not claimed:
+                        continue
+                    same_flight = (sample.flight_number, sample.scheduled_date) == (row.flight_number, row.scheduled_date)
+                    # A reused id belongs to a new flight; the old one's stats stay
+                    if same_flight and sample.minutes is not None:
+                        bucket = buckets[(sample.gate_number, sample.aircraft_type, sample.hour_of_day)]
+                        bucket[0] -= 1
+                        bucket[1] -= sample.minutes
+                    key, minutes = contribution or ((None, None, None), None)
+                    sample.flight_number, sample.scheduled_date = row.flight_number, row.scheduled_date
+                    sample.gate_number, sample.aircraft_type, sample.hour_of_day = key
+                    sample.minutes = minutes
+                if contribution is not None:
+                    bucket = buckets[contribution[0]]
+                    bucket[0] += 1
+                    bucket[1] += contribution[1]
+            # New samples insert here; a worker folding the same flights fails
+            # on the primary key and leaves them to the one that got there first
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            return self.load()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        try:
+            buckets = {k: v for k, v in buckets.items() if v[0] or v[1]}
+            existing = {
+                (s.gate_number, s.aircraft_type, s.hour_of_day): s
+                for s in TurnaroundStat.query.filter(
+                    TurnaroundStat.gate_number.in_({k[0] for k in buckets})
+                )
+            }
+            for key, (count, minutes) in buckets.items():
+                stat = existing.get(key)
+                if stat is None:
+                    stat = TurnaroundStat(
+                        gate_number=key[0], aircraft_type=key[1], hour_of_day=key[2],
+                        sample_count=0, total_minutes=0
+                    )
+                    db.session.add(stat)
+                stat.sample_count += count
+                stat.total_minutes += minutes
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        return self.load()
+
+    def load(self):
+        """Rebuild the in-memory lookup tables from ``turnaround_stats``"""
+        by_hour = {}
+        by_type = defaultdict(lambda: [0, 0.0])
+        by_gate = defaultdict(lambda: [0, 0.0])
+        rows = db.session.query(
+            TurnaroundStat.gate_number, TurnaroundStat.aircraft_type, TurnaroundStat.hour_of_day,
+            TurnaroundStat.sample_count, TurnaroundStat.total_minutes
+        )
+        for gate_number, aircraft_type, hour, count, minutes in rows:
+            if not count:
+                continue
+            if count >= MIN_SAMPLES:
+                by_hour[(gate_number, aircraft_type, hour)] = minutes / count
+            by_type[(gate_number, aircraft_type)][0] += count
+            by_type[(gate_number, aircraft_type)][1] += minutes
+            by_gate[gate_number][0] += count
+            by_gate[gate_number][1] += minutes
+
+        with self._lock:
+            self.by_hour = by_hour
+            self.by_type = {k: m / c for k, (c, m) in by_type.items() if c >= MIN_SAMPLES}
+            self.by_gate = {k: m / c for k, (c, m) in by_gate.items() if c >= MIN_SAMPLES}
+            self._last_refresh = time.monotonic()
+            self.version += 1
+        return len(by_hour)
+
+    def refresh_if_stale(self):
+        """Refresh at most once per ``refresh_interval`` seconds"""
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+
+    def lookup(self, gate_number, aircraft_type, hour):
+        """Mean turnaround minutes for the most specific bucket with enough data, or None"""
+        minutes = self.by_hour.get((gate_number, aircraft_type, hour))
+        if minutes is None:
+            minutes = self.by_type.get((gate_number, aircraft_type))
+        if minutes is None:
+            minutes = self.by_gate.get(gate_number)
+        return minutes
+
+    def table(self, gate_numbers, aircraft_types):
+        """Lookup results as an array indexed [type, hour, gate], NaN where unknown.
+
+        Hour index 24 holds the (gate, type) fallback for flights without an hour.
+        """
+        with self._lock:
+            by_hour, by_type, by_gate = self.by_hour, self.by_type, self.by_gate
+        gate_index = {g: j for j, g in enumerate(gate_numbers)}
+        type_index = {t: k for k, t in enumerate(aircraft_types)}
+        table = np.full((len(aircraft_types), 25, len(gate_numbers)), np.nan)
+        for gate_number, minutes in by_gate.items():
+            if gate_number in gate_index:
+                table[:, :, gate_index[gate_number]] = minutes
+        for (gate_number, aircraft_type), minutes in by_type.items():
+            if gate_number in gate_index and aircraft_type in type_index:
+                table[type_index[aircraft_type], :, gate_index[gate_number]] = minutes
+        for (gate_number, aircraft_type, hour), minutes in by_hour.items():
+            if gate_number in gate_index and aircraft_type in type_index and 0 <= hour < 24:
+                table[type_index[aircraft_type], hour, gate_index[gate_number]] = minutes
+        return table
@@ -0,0 +1,179 @@
+"""Vectorized validation of uploaded flight rows.
+
+Each batch of rows arrives as a DataFrame and every check runs column-wise
+over the whole batch. Large files are validated in a process pool so parsing
+keeps pace with the bulk insert. Problems are reported as
+``[row, column, reason]`` triples, where ``row`` is the 1-based spreadsheet
+row number (the header is row 1). Blank rows count towards the numbering:
+readers index each batch by source row number (see ``number_rows``) before
+dropping blank rows.
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+REQUIRED_FIELDS = ('flight_number', 'scheduled_date', 'scheduled_time', 'aircraft_type', 'flight_type')
+OPTIONAL_FIELDS = ('aircraft_registration', 'new_position', 'old_position', 'assigned_gate', 'planned_gate', 'status')
+GATE_FIELDS = ('assigned_gate', 'planned_gate')
+
+ALLOWED_VALUES = {
+    'aircraft_type': ('narrow_body', 'wide_body'),
+    'flight_type': ('arrival', 'departure'),
+}
+
+TIME_FORMATS = ('%H:%M', '%H:%M:%S')
+
+# Files smaller than this are validated inline; spinning up workers costs more
+PARALLEL_MIN_ROWS = 20000
+
+
+def _as_text(series):
+    """Strip strings and turn blanks into NaN so isna() means "missing" everywhere"""
+    if series.dtype != object:
+        return series
+    text = series.where(series.isna(), series.astype(str).str.strip())
+    return text.mask(text == '')
+
+
+def _parse_dates(series):
+    parsed = pd.to_datetime(series, errors='coerce', format='ISO8601')
+    retry = parsed.isna() & series.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(series[retry].astype(str), errors='coerce', format='mixed')
+    return parsed
+
+
+def _parse_times(series):
+    text = series.astype(str)
+    parsed = pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+    for fmt in TIME_FORMATS:
+        todo = parsed.isna() & series.notna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(text[todo], errors='coerce', format=fmt)
+    # Excel datetimes and other free-form values
+    todo = parsed.isna() & series.notna()
+    if todo.any():
+        parsed[todo] = pd.to_datetime(text[todo], errors='coerce', format='mixed')
+    return parsed
+
+
+def number_rows(df, first_row):
+    """Index ``df`` by source row number, starting at ``first_row``, then drop blank rows"""
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    blank = pd.Series(True, index=df.index)
+    for column in df.columns:
+        blank &= _as_text(df[column]).isna()
+    return df[~blank]
+
+
+def _report(problems, mask, row_numbers, column, reason):
+    for idx in mask[mask].index:
+        problems.append([int(row_numbers[idx]), column, reason])
+
+
+def validate_frame(df, gate_numbers, first_row=2, row_numbers=None):
+    """Validate one batch and return (flight value dicts, errors, warnings).
+
+    Problems are reported against ``row_numbers`` (one source row number per
+    row), or consecutive numbers from ``first_row``. Rows with errors are
+    dropped. Unknown gates are only warnings so stands missing from the gate
+    catalogue do not block an import.
+    """
+    if row_numbers is None:
+        row_numbers = range(first_row, first_row + len(df))
+    row_numbers = list(row_numbers)
+    df = df.reset_index(drop=True)
+    for column in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+        if column not in df.columns:
+            df[column] = None
+        df[column] = _as_text(df[column])
+
+    errors = []
+    warnings = []
+    bad = pd.Series(False, index=df.index)
+
+    for column in REQUIRED_FIELDS:
+        missing = df[column].isna()
+        _report(errors, missing, row_numbers, column, 'required')
+        bad |= missing
+
+    dates = _parse_dates(df['scheduled_date'])
+    invalid = dates.isna() & df['scheduled_date'].notna()
+    _report(errors, invalid, row_numbers, 'scheduled_date', 'unparseable date')
+    bad |= invalid
+
+    times = _parse_times(df['scheduled_time'])
+    invalid = times.isna() & df['scheduled_time'].notna()
+    _report(errors, invalid, row_numbers, 'scheduled_time', 'unparseable time')
+    bad |= invalid
+
+    for column, allowed in ALLOWED_VALUES.items():
+        invalid = df[column].notna() & ~df[column].isin(allowed)
+        _report(errors, invalid, row_numbers, column, f"must be one of {', '.join(allowed)}")
+        bad |= invalid
+
+    if gate_numbers:
+        for column in GATE_FIELDS:
+            unknown = df[column].notna() & ~df[column].astype(str).isin(gate_numbers)
+            _report(warnings, unknown, row_numbers, column, 'unknown gate')
+
+    good = ~bad
+    values = pd.DataFrame({
+        'flight_number': df.loc[good, 'flight_number'].astype(str),
+        'scheduled_date': dates[good].dt.date,
+        'scheduled_time': times[good].dt.time,
+        'aircraft_type': df.loc[good, 'aircraft_type'],
+        'flight_type': df.loc[good, 'flight_type'],
+    })
+    for column in OPTIONAL_FIELDS:
+        values[column] = df.loc[good, column].fillna('').astype(str)
+    values['status'] = values['status'].mask(values['status'] == '', 'scheduled')
+
+    return values.to_dict('records'), errors, warnings
+
+
+def _validate_job(args):
+    df, gate_numbers, row_numbers = args
+    return validate_frame(df, gate_numbers, row_numbers=row_numbers)
+
+
+def validate_batches(batches, gate_numbers, workers=None):
+    """Validate DataFrame batches in order, yielding (rows, values, errors, warnings).
+
+    Each batch is indexed by source row number, as ``number_rows`` leaves it.
+    The first PARALLEL_MIN_ROWS rows are validated inline. Past that, batches
+    go to a process pool with a bounded number in flight, so memory stays
+    proportional to the worker count rather than the file size.
+    """
+    workers = workers or os.cpu_count() or 1
+    seen_rows = 0
+    pool = None
+    pending = deque()
+    try:
+        for df in batches:
+            job = (df, gate_numbers, df.index.tolist())
+            seen_rows += len(df)
+
+            if pool is None and (workers < 2 or seen_rows < PARALLEL_MIN_ROWS):
+                yield (len(df),) + _validate_job(job)
+                continue
+
+            if pool is None:
+                # spawn: forking a threaded WSGI worker is not safe
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            pending.append((len(df), pool.submit(_validate_job, job)))
+            if len(pending) >= workers * 2:
+                size, future = pending.popleft()
+                yield (size,) + future.result()
+
+        while pending:
+            size, future = pending.popleft()
+            yield (size,) + future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
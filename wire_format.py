@@ -0,0 +1,95 @@
+import gzip
+import json
+from datetime import date, datetime, time
+from flask import Response
+from gate_timeline import to_epoch
+
+# Opt-in media types; anything else gets the regular row-oriented JSON
+COLUMNAR_JSON = 'application/vnd.gate.columnar+json'
+COLUMNAR_MSGPACK = 'application/vnd.gate.columnar+msgpack'
+ROW_JSON = 'application/json'
+
+# Only compress payloads big enough for it to pay off
+MIN_COMPRESS_BYTES = 1024
+
+
+def _optional_module(name):
+    try:
+        return __import__(name)
+    except ImportError:
+        return None
+
+
+def _encode_value(value):
+    """Timestamps become epoch seconds, times become seconds since midnight"""
+    if isinstance(value, datetime):
+        return to_epoch(value)
+    if isinstance(value, date):
+        return to_epoch(datetime.combine(value, time()))
+    if isinstance(value, time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    return value
+
+
+def encode_columnar(fields, rows, dict_fields=()):
+    """Encode row tuples as column arrays.
+
+    ``dict_fields`` (low-cardinality strings such as gates, types and
+    statuses) are stored as indexes into a per-column dictionary.
+    """
+    columns = {}
+    dictionaries = {}
+    values_by_field = list(zip(*rows)) if rows else [() for _ in fields]
+
+    for field, values in zip(fields, values_by_field):
+        if field in dict_fields:
+            lookup = {}
+            codes = []
+            for value in values:
+                if value is None or value == '':
+                    codes.append(None)
+                    continue
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(lookup)
+                codes.append(code)
+            columns[field] = codes
+            dictionaries[field] = list(lookup)
+        else:
+            columns[field] = [_encode_value(v) for v in values]
+
+    return {
+        'format': 'columnar',
+        'count': len(rows),
+        'fields': list(fields),
+        'columns': columns,
+        'dictionaries': dictionaries
+    }
+
+
+def negotiate(req):
+    """Return the response media type the client asked for via Accept"""
+    offered = [ROW_JSON, COLUMNAR_JSON]
+    if _optional_module('msgpack') is not None:
+        offered.append(COLUMNAR_MSGPACK)
+    return req.accept_mimetypes.best_match(offered, default=ROW_JSON)
+
+
+def columnar_response(req, payload, media_type):
+    """Serialize a columnar payload, compressing it per Accept-Encoding"""
+    if media_type == COLUMNAR_MSGPACK:
+        body = _optional_module('msgpack').packb(payload, use_bin_type=True)
+    else:
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        brotli = _optional_module('brotli')
+        if brotli is not None and req.accept_encodings['br']:
+            body = brotli.compress(body, quality=5)
+            headers['Content-Encoding'] = 'br'
+        elif req.accept_encodings['gzip']:
+            body = gzip.compress(body, compresslevel=5)
+            headers['Content-Encoding'] = 'gzip'
+
+    return Response(body, mimetype=media_type, headers=headers)